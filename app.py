@@ -7,11 +7,8 @@
 from yahoo_adapter import (
     fetch_prices_daily,
     fetch_intraday_1m,
-    fetch_fundamentals,
-    fetch_profile,
-    fetch_market_cap,
+    fetch_all,
     fetch_greenwald_history,
-    fetch_working_capital_quarterly,
 )
 import math
 import json
@@ -392,7 +389,8 @@ def render_data_quality_flags():
 # -----------------------------
 # ---------- UTIL -------------
 # -----------------------------
-@st.cache_data
+# Not cached here: fetch_prices_daily() caches successful downloads itself, and
+# caching this wrapper too would pin an empty Series after a failed request.
 def load_prices(ticker: str, years: int = 10) -> pd.Series:
     """Fetch daily prices and return a 1-D float Series (prefer 'Close')."""
     try:
@@ -708,11 +706,9 @@ def init_defaults():
 def fetch_and_fill_from_yahoo():
     """Callback for the Fetch button—safe to mutate session_state before widgets render next run."""
     ticker = st.session_state.get("inp_ticker", "KO")
-    prof = fetch_profile(ticker)
-    if prof.get("sector"): st.session_state["inp_sector"] = prof["sector"]
-    if prof.get("industry"): st.session_state["inp_industry"] = prof["industry"]
-
-    funda = fetch_fundamentals(ticker)
+    funda = fetch_all(ticker)  # fundamentals + profile + market cap + history, one round of requests
+    if funda.get("sector"): st.session_state["inp_sector"] = funda["sector"]
+    if funda.get("industry"): st.session_state["inp_industry"] = funda["industry"]
 
     def _maybe(target_key: str, val):
         if val is None: return
@@ -731,15 +727,15 @@ def fetch_and_fill_from_yahoo():
     _maybe("inp_ppe", funda.get("ppe_net"))
 
     # Δ Working Capital (quarterly latest change)
-    wc_series = fetch_working_capital_quarterly(ticker)  # newest last
+    wc_series = funda["working_capital_quarterly"]  # newest last
     if wc_series and len(wc_series) >= 2:
         st.session_state["inp_delta_wc"] = float((wc_series[-1] or 0.0) - (wc_series[-2] or 0.0))
 
     # Preload Greenwald history for the next render
-    gh = fetch_greenwald_history(ticker)
+    gh = funda["greenwald_history"]
     st.session_state["__greenwald_hist"] = gh  # dict with 'sales', 'ppe_net', 'capex'
 
-    mc = fetch_market_cap(ticker)
+    mc = funda.get("market_cap")
     if mc is not None and not (isinstance(mc, float) and math.isnan(mc)):
         st.session_state["inp_eq_mkt"] = float(mc)
 
@@ -1227,26 +1223,25 @@ def main():
                 "Volatility": fmt_pct(vol),
                 "Capital Preservation": f"{score_cprs * 100:.1f}/100",
             }
-            pdf_file = export_pdf(f"{ticker}_report.pdf", ticker, buffett_score, metrics)
+            pdf_file = export_pdf(f"{ticker}_report.pdf", ticker, buffett_score, metrics, preformatted=True)
             st.success(f"Exported to {pdf_file}")
             with open(pdf_file, "rb") as f:
                 st.download_button("Download PDF", f, file_name=f"{ticker}_report.pdf", mime="application/pdf")
 
-    # ---- Compile company data for ChatGPT context ----
-    company_data = get_current_company_data(
-        ticker=ticker,
-        oe_final=oe_final,
-        lt=lt,
-        z=z,
-        zone=zone,
-        score_cprs=score_cprs,
-        buffett_score=buffett_score,
-        net_income=net_income,
-        sales=sales
-    )
-
-    # ---- Auto-render ChatGPT modal at the bottom ----
-    render_chatgpt_modal(chat_integration, ticker, company_data)
+    # ---- ChatGPT modal at the bottom (skip all context work while it is closed) ----
+    if st.session_state.get("show_chatgpt_modal", False):
+        company_data = get_current_company_data(
+            ticker=ticker,
+            oe_final=oe_final,
+            lt=lt,
+            z=z,
+            zone=zone,
+            score_cprs=score_cprs,
+            buffett_score=buffett_score,
+            net_income=net_income,
+            sales=sales
+        )
+        render_chatgpt_modal(chat_integration, ticker, company_data)
 
     # ---- Notes ----
     st.caption("""
@@ -8,14 +8,115 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.colors import HexColor
 from reportlab.lib import colors
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import List, Dict
+from functools import lru_cache
+from typing import BinaryIO, List, Dict, Optional, Tuple
+import io
 import os
 
+# Optional: splice the pre-rendered static pages instead of re-laying them out
+try:
+    import pikepdf
+    PIKEPDF_AVAILABLE = True
+except ImportError:
+    PIKEPDF_AVAILABLE = False
+
+_STYLES = getSampleStyleSheet()
+
+# Static report sections. Built once: parsing the paragraph markup is the
+# expensive part, and the same flowables can be laid out in every document.
+_PRINCIPLES_HTML = """
+    <b>1. Circle of Competence:</b> Invest only in businesses you understand completely.<br/><br/>
+    <b>2. Economic Moats:</b> Look for companies with sustainable competitive advantages.<br/><br/>
+    <b>3. Owner Earnings:</b> Focus on real cash generation, not just reported earnings.<br/><br/>
+    <b>4. Management Quality:</b> Invest in companies with honest, capable management.<br/><br/>
+    <b>5. Intrinsic Value:</b> Buy when market price is significantly below intrinsic value.<br/><br/>
+    <b>6. Long-term Perspective:</b> Hold great businesses for the very long term.<br/><br/>
+    <b>7. Capital Allocation:</b> Management should efficiently deploy shareholder capital.<br/><br/>
+    <b>8. Financial Strength:</b> Companies should have strong balance sheets and manageable debt.<br/><br/>
+    <b>9. Predictable Earnings:</b> Prefer businesses with stable, predictable cash flows.<br/><br/>
+    <b>10. Price Discipline:</b> Be patient and disciplined about entry prices.
+    """
+
+_FINAL_DISCLAIMER_HTML = (
+    "<b>Important Disclaimer:</b> This report combines traditional financial analysis with AI-generated insights. "
+    "While the financial metrics are based on reported data, the AI analysis should be considered supplementary "
+    "and may contain inaccuracies. This is not investment advice. Always conduct your own research and consult "
+    "with qualified financial professionals before making investment decisions. Past performance does not guarantee future results."
+)
+
+_CHAT_DISCLAIMER_HTML = (
+    "<b>Disclaimer:</b> This analysis is for informational purposes only and should not be "
+    "considered as investment advice. AI-generated responses may contain errors or biases. "
+    "Please consult with a qualified financial advisor before making investment decisions."
+)
+
+_DISCLAIMER_STYLE = ParagraphStyle('Disclaimer', parent=_STYLES['Normal'], fontSize=8, textColor=HexColor('#666666'))
+
+_PRINCIPLES_HEADING_FLOWABLE = Paragraph("Warren Buffett's Investment Principles", _STYLES['Heading2'])
+_PRINCIPLES_FLOWABLE = Paragraph(_PRINCIPLES_HTML, _STYLES['Normal'])
+_FINAL_DISCLAIMER_FLOWABLE = Paragraph(_FINAL_DISCLAIMER_HTML, _DISCLAIMER_STYLE)
+_CHAT_DISCLAIMER_FLOWABLE = Paragraph(_CHAT_DISCLAIMER_HTML, _STYLES['Normal'])
+
+
+class _NA(dict):
+    """Mapping for str.format_map that renders missing keys as 'N/A'."""
+
+    def __missing__(self, key):
+        return 'N/A'
+
+
+_CONTEXT_TMPL = """
+    <b>Net Income:</b> {net_income}<br/>
+    <b>Sales:</b> {sales}<br/>
+    <b>Owner Earnings:</b> {owner_earnings}<br/>
+    <b>Look-Through Earnings:</b> {look_through_earnings}<br/>
+    <b>Altman Z-Score:</b> {altman_z}<br/>
+    <b>Capital Preservation Score:</b> {capital_preservation}<br/>
+    <b>Buffett Score:</b> {buffett_score}
+    """
+
+_SUMMARY_TMPL = """
+    <b>Investment Summary for {ticker}</b><br/><br/>
+    <b>Overall Buffett Score:</b> {buffett_score}<br/>
+    <b>Circle of Competence:</b> {circle_of_competence}<br/>
+    <b>Owner Earnings Quality:</b> {owner_earnings}<br/>
+    <b>Capital Preservation:</b> {capital_preservation}<br/>
+    <b>Business Moat Assessment:</b> Requires further analysis<br/><br/>
+    <b>Export Date:</b> {export_date}
+    """
+
+# Key Financial Metrics table: (row label, company_data key)
+_METRICS_SCHEMA = (
+    ("Net Income", "net_income"),
+    ("Sales/Revenue", "sales"),
+    ("Owner Earnings", "owner_earnings"),
+    ("Look-Through Earnings", "look_through_earnings"),
+    ("Altman Z-Score", "altman_z"),
+    ("Capital Preservation", "capital_preservation"),
+    ("Buffett Score", "buffett_score"),
+)
+
+_METRICS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#1f77b4")),
+    ('TEXTCOLOR',(0,0),(-1,0), colors.white),
+    ('ALIGN',(0,0),(-1,-1),'LEFT'),
+    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0,0), (-1,0), 12),
+    ('BOTTOMPADDING', (0,0), (-1,0), 12),
+    ('BACKGROUND',(0,1),(-1,-1), colors.HexColor("#f8f9fa")),
+    ('GRID', (0,0), (-1,-1), 1, colors.HexColor("#dee2e6")),
+    ('FONTSIZE', (0,1), (-1,-1), 10),
+    ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+    ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, colors.HexColor("#f8f9fa")])
+])
+
 def export_chat_to_pdf(filename: str, 
                       ticker: str, 
                       chat_history: List[Dict], 
-                      company_data: Dict) -> str:
+                      company_data: Dict,
+                      output: Optional[BinaryIO] = None) -> str:
     """
     Export ChatGPT conversation to PDF with company context.
     
@@ -24,6 +125,8 @@ def export_chat_to_pdf(filename: str,
         ticker: Company ticker symbol
         chat_history: List of chat messages
         company_data: Company financial data for context
+        output: Optional file-like object (e.g. io.BytesIO) to write the PDF
+            into instead of creating ``filename`` on disk
     
     Returns:
         str: Path to the created PDF file
@@ -33,12 +136,11 @@ def export_chat_to_pdf(filename: str,
     if not filename.endswith('.pdf'):
         filename += '.pdf'
     
-    doc = SimpleDocTemplate(filename, pagesize=letter, 
+    doc = SimpleDocTemplate(output if output is not None else filename, pagesize=letter, 
                           rightMargin=72, leftMargin=72, 
                           topMargin=72, bottomMargin=18)
     
-    # Get styles
-    styles = getSampleStyleSheet()
+    styles = _STYLES
     
     # Custom styles for chat
     user_style = ParagraphStyle(
@@ -94,15 +196,7 @@ def export_chat_to_pdf(filename: str,
     story.append(Paragraph("Company Financial Summary", styles['Heading2']))
     story.append(Spacer(1, 12))
     
-    context_text = f"""
-    <b>Net Income:</b> {company_data.get('net_income', 'N/A')}<br/>
-    <b>Sales:</b> {company_data.get('sales', 'N/A')}<br/>
-    <b>Owner Earnings:</b> {company_data.get('owner_earnings', 'N/A')}<br/>
-    <b>Look-Through Earnings:</b> {company_data.get('look_through_earnings', 'N/A')}<br/>
-    <b>Altman Z-Score:</b> {company_data.get('altman_z', 'N/A')}<br/>
-    <b>Capital Preservation Score:</b> {company_data.get('capital_preservation', 'N/A')}<br/>
-    <b>Buffett Score:</b> {company_data.get('buffett_score', 'N/A')}
-    """
+    context_text = _CONTEXT_TMPL.format_map(_NA(company_data))
     
     context_para = Paragraph(context_text, styles['Normal'])
     story.append(context_para)
@@ -139,13 +233,7 @@ def export_chat_to_pdf(filename: str,
     
     # Add disclaimer
     story.append(Spacer(1, 24))
-    disclaimer = Paragraph(
-        "<b>Disclaimer:</b> This analysis is for informational purposes only and should not be "
-        "considered as investment advice. AI-generated responses may contain errors or biases. "
-        "Please consult with a qualified financial advisor before making investment decisions.",
-        styles['Normal']
-    )
-    story.append(disclaimer)
+    story.append(_CHAT_DISCLAIMER_FLOWABLE)
     
     # Build PDF
     doc.build(story)
@@ -153,33 +241,18 @@ def export_chat_to_pdf(filename: str,
     return filename
 
 
-def export_enhanced_chat_pdf(filename: str, 
-                           ticker: str, 
-                           chat_history: List[Dict], 
-                           company_data: Dict,
-                           buffett_metrics: Dict) -> str:
-    """
-    Enhanced PDF export with additional Buffett analysis integration.
-    
-    Args:
-        filename: Output PDF filename
-        ticker: Company ticker symbol  
-        chat_history: List of chat messages
-        company_data: Company financial data
-        buffett_metrics: Additional Buffett-specific metrics
-    
-    Returns:
-        str: Path to the created PDF file
-    """
-    
-    if not filename.endswith('.pdf'):
-        filename += '.pdf'
-    
-    doc = SimpleDocTemplate(filename, pagesize=letter,
-                          rightMargin=72, leftMargin=72,
-                          topMargin=72, bottomMargin=18)
-    
-    styles = getSampleStyleSheet()
+def _enhanced_doc(target) -> SimpleDocTemplate:
+    return SimpleDocTemplate(target, pagesize=letter,
+                             rightMargin=72, leftMargin=72,
+                             topMargin=72, bottomMargin=18)
+
+
+def _enhanced_story(ticker: str,
+                    chat_history: List[Dict],
+                    company_data: Dict,
+                    buffett_metrics: Dict) -> list:
+    """Per-export part of the enhanced report (everything before the principles page)."""
+    styles = _STYLES
     story = []
     
     # Enhanced title page with Buffett focus
@@ -202,15 +275,12 @@ def export_enhanced_chat_pdf(filename: str,
         spaceAfter=18
     )
     
-    summary_text = f"""
-    <b>Investment Summary for {ticker}</b><br/><br/>
-    <b>Overall Buffett Score:</b> {company_data.get('buffett_score', 'N/A')}<br/>
-    <b>Circle of Competence:</b> {buffett_metrics.get('circle_of_competence', 'Check required')}<br/>
-    <b>Owner Earnings Quality:</b> {company_data.get('owner_earnings', 'N/A')}<br/>
-    <b>Capital Preservation:</b> {company_data.get('capital_preservation', 'N/A')}<br/>
-    <b>Business Moat Assessment:</b> Requires further analysis<br/><br/>
-    <b>Export Date:</b> {datetime.now().strftime('%B %d, %Y at %I:%M %p')}
-    """
+    summary_text = _SUMMARY_TMPL.format_map(_NA(
+        company_data,
+        ticker=ticker,
+        circle_of_competence=buffett_metrics.get('circle_of_competence', 'Check required'),
+        export_date=datetime.now().strftime('%B %d, %Y at %I:%M %p'),
+    ))
     
     summary_para = Paragraph(summary_text, summary_style)
     story.append(summary_para)
@@ -221,29 +291,10 @@ def export_enhanced_chat_pdf(filename: str,
     
     metrics_data = [
         ["Metric", "Value"],
-        ["Net Income", company_data.get('net_income', 'N/A')],
-        ["Sales/Revenue", company_data.get('sales', 'N/A')],
-        ["Owner Earnings", company_data.get('owner_earnings', 'N/A')],
-        ["Look-Through Earnings", company_data.get('look_through_earnings', 'N/A')],
-        ["Altman Z-Score", company_data.get('altman_z', 'N/A')],
-        ["Capital Preservation", company_data.get('capital_preservation', 'N/A')],
-        ["Buffett Score", company_data.get('buffett_score', 'N/A')]
+        *([label, company_data.get(key, 'N/A')] for label, key in _METRICS_SCHEMA),
     ]
     
-    metrics_table = Table(metrics_data, colWidths=[250, 200])
-    metrics_table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#1f77b4")),
-        ('TEXTCOLOR',(0,0),(-1,0), colors.white),
-        ('ALIGN',(0,0),(-1,-1),'LEFT'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,0), 12),
-        ('BOTTOMPADDING', (0,0), (-1,0), 12),
-        ('BACKGROUND',(0,1),(-1,-1), colors.HexColor("#f8f9fa")),
-        ('GRID', (0,0), (-1,-1), 1, colors.HexColor("#dee2e6")),
-        ('FONTSIZE', (0,1), (-1,-1), 10),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, colors.HexColor("#f8f9fa")])
-    ]))
+    metrics_table = Table(metrics_data, colWidths=[250, 200], style=_METRICS_TABLE_STYLE)
     
     story.append(metrics_table)
     story.append(Spacer(1, 24))
@@ -280,45 +331,129 @@ def export_enhanced_chat_pdf(filename: str,
                 )
                 header = f"<b>AI Analysis:</b>"
             
-            content = f"{header}<br/>{msg['content'].replace('\n', '<br/>')}"
+            body = msg['content'].replace('\n', '<br/>')
+            content = f"{header}<br/>{body}"
             para = Paragraph(content, style)
             story.append(para)
             story.append(Spacer(1, 6))
     else:
         story.append(Paragraph("No AI conversation recorded for this analysis.", styles['Normal']))
     
-    # Add Buffett principles reference
-    story.append(PageBreak())
-    story.append(Paragraph("Warren Buffett's Investment Principles", styles['Heading2']))
-    story.append(Spacer(1, 12))
+    return story
+
+
+def export_enhanced_chat_pdf(filename: str, 
+                           ticker: str, 
+                           chat_history: List[Dict], 
+                           company_data: Dict,
+                           buffett_metrics: Dict,
+                           output: Optional[BinaryIO] = None) -> str:
+    """
+    Enhanced PDF export with additional Buffett analysis integration.
     
-    principles_text = """
-    <b>1. Circle of Competence:</b> Invest only in businesses you understand completely.<br/><br/>
-    <b>2. Economic Moats:</b> Look for companies with sustainable competitive advantages.<br/><br/>
-    <b>3. Owner Earnings:</b> Focus on real cash generation, not just reported earnings.<br/><br/>
-    <b>4. Management Quality:</b> Invest in companies with honest, capable management.<br/><br/>
-    <b>5. Intrinsic Value:</b> Buy when market price is significantly below intrinsic value.<br/><br/>
-    <b>6. Long-term Perspective:</b> Hold great businesses for the very long term.<br/><br/>
-    <b>7. Capital Allocation:</b> Management should efficiently deploy shareholder capital.<br/><br/>
-    <b>8. Financial Strength:</b> Companies should have strong balance sheets and manageable debt.<br/><br/>
-    <b>9. Predictable Earnings:</b> Prefer businesses with stable, predictable cash flows.<br/><br/>
-    <b>10. Price Discipline:</b> Be patient and disciplined about entry prices.
+    Args:
+        filename: Output PDF filename
+        ticker: Company ticker symbol  
+        chat_history: List of chat messages
+        company_data: Company financial data
+        buffett_metrics: Additional Buffett-specific metrics
+        output: Optional file-like object (e.g. io.BytesIO) to write the PDF
+            into instead of creating ``filename`` on disk
+    
+    Returns:
+        str: Path to the created PDF file
     """
     
-    principles_para = Paragraph(principles_text, styles['Normal'])
-    story.append(principles_para)
+    if not filename.endswith('.pdf'):
+        filename += '.pdf'
     
-    # Final disclaimer
-    story.append(Spacer(1, 24))
-    final_disclaimer = Paragraph(
-        "<b>Important Disclaimer:</b> This report combines traditional financial analysis with AI-generated insights. "
-        "While the financial metrics are based on reported data, the AI analysis should be considered supplementary "
-        "and may contain inaccuracies. This is not investment advice. Always conduct your own research and consult "
-        "with qualified financial professionals before making investment decisions. Past performance does not guarantee future results.",
-        ParagraphStyle('Disclaimer', parent=styles['Normal'], fontSize=8, textColor=HexColor('#666666'))
-    )
-    story.append(final_disclaimer)
+    doc = _enhanced_doc(output if output is not None else filename)
+    story = _enhanced_story(ticker, chat_history, company_data, buffett_metrics)
+    
+    # Buffett principles reference + final disclaimer (static, pre-built)
+    story.append(PageBreak())
+    story.extend(_static_tail())
     
     # Build the enhanced PDF
     doc.build(story)
-    return filename
\ No newline at end of file
+    return filename
+
+
+def _static_tail() -> list:
+    """Principles page content + final disclaimer, identical in every enhanced report."""
+    return [
+        _PRINCIPLES_HEADING_FLOWABLE,
+        Spacer(1, 12),
+        _PRINCIPLES_FLOWABLE,
+        Spacer(1, 24),
+        _FINAL_DISCLAIMER_FLOWABLE,
+    ]
+
+
+@lru_cache(maxsize=1)
+def _static_tail_pdf() -> bytes:
+    """The static tail rendered to its own PDF once per process."""
+    buf = io.BytesIO()
+    _enhanced_doc(buf).build(_static_tail())
+    return buf.getvalue()
+
+
+def export_enhanced_chat_pdf_fast(filename: str,
+                                  ticker: str,
+                                  chat_history: List[Dict],
+                                  company_data: Dict,
+                                  buffett_metrics: Dict,
+                                  output: Optional[BinaryIO] = None) -> str:
+    """
+    Same report as export_enhanced_chat_pdf, but only the per-export pages are
+    laid out; the principles/disclaimer page is rendered once per process and
+    appended with pikepdf. Falls back to export_enhanced_chat_pdf when pikepdf
+    is not installed.
+    
+    Args/Returns: as export_enhanced_chat_pdf
+    """
+    if not PIKEPDF_AVAILABLE:
+        return export_enhanced_chat_pdf(filename, ticker, chat_history,
+                                        company_data, buffett_metrics, output=output)
+    
+    if not filename.endswith('.pdf'):
+        filename += '.pdf'
+    
+    body = io.BytesIO()
+    _enhanced_doc(body).build(_enhanced_story(ticker, chat_history, company_data, buffett_metrics))
+    body.seek(0)
+    
+    with pikepdf.open(body) as pdf, pikepdf.open(io.BytesIO(_static_tail_pdf())) as tail:
+        pdf.pages.extend(tail.pages)
+        pdf.save(output if output is not None else filename)
+    
+    return filename
+
+
+def _render_one(job: Tuple[str, str, List[Dict], Dict, Dict]) -> bytes:
+    """Worker for export_batch: render one enhanced report into memory."""
+    buf = io.BytesIO()
+    export_enhanced_chat_pdf_fast(*job, output=buf)
+    return buf.getvalue()
+
+
+def export_batch(jobs: List[Tuple[str, str, List[Dict], Dict, Dict]],
+                 max_workers: Optional[int] = None) -> List[bytes]:
+    """
+    Render several enhanced reports (e.g. a watchlist) in parallel.
+    
+    ReportLab layout is CPU-bound pure Python, so each report is built in
+    its own worker process.
+    
+    Args:
+        jobs: (filename, ticker, chat_history, company_data, buffett_metrics)
+            tuples, the same arguments export_enhanced_chat_pdf takes
+        max_workers: Process count (defaults to the CPU count)
+    
+    Returns:
+        List[bytes]: PDF bytes for each job, in input order
+    """
+    if len(jobs) <= 1:
+        return [_render_one(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as ex:
+        return list(ex.map(_render_one, jobs))
@@ -4,16 +4,19 @@
 
 from __future__ import annotations
 
+import io
 import os
+from collections import deque
 from datetime import datetime
-from typing import List, Dict, Optional
+from functools import lru_cache
+from typing import Deque, List, Dict, Optional
 from dataclasses import dataclass
 
 import streamlit as st
 from dotenv import load_dotenv, find_dotenv
 
 # PDF helpers (already in your codebase)
-from chat_pdf_export import export_chat_to_pdf, export_enhanced_chat_pdf  # noqa: F401
+from chat_pdf_export import export_chat_to_pdf, export_enhanced_chat_pdf, export_enhanced_chat_pdf_fast  # noqa: F401
 
 # OpenAI SDK v1+
 from openai import OpenAI
@@ -37,7 +40,8 @@ except Exception:
 # ----- dotenv + helpers -------
 # -----------------------------
 _ENV_PATH = find_dotenv(usecwd=True)
-load_dotenv(_ENV_PATH, override=False)
+if _ENV_PATH:
+    load_dotenv(_ENV_PATH, override=False)
 
 DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
@@ -47,10 +51,14 @@ DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 SHOW_CHATGPT_DEBUG = False
 
 
+@lru_cache(maxsize=1)
 def _get_env_api_key() -> Optional[str]:
     """
     Priority: OPENAI_API_KEY -> st.secrets -> AZURE_OPENAI_API_KEY
     (Azure path only used if Azure endpoint is configured)
+
+    Resolved once per process; call _get_env_api_key.cache_clear() after the
+    environment/secrets change (e.g. when a key is saved from the UI).
     """
     key = os.getenv("OPENAI_API_KEY")
     if key:
@@ -79,7 +87,67 @@ def _mask(s: Optional[str], keep: int = 4) -> str:
     if not s:
         return "None"
     s = str(s)
-    return f"{'*' * max(0, len(s) - keep)}{s[-keep:]}"
+    # Cap the star prefix; the key length itself is not useful for display
+    return f"{'*' * min(8, max(0, len(s) - keep))}{s[-keep:]}"
+
+
+class _NA(dict):
+    """Mapping for str.format_map that renders missing keys as 'N/A'."""
+
+    def __missing__(self, key):
+        return 'N/A'
+
+
+_SYSTEM_CONTEXT_TMPL = (
+    "You are an expert financial analyst assistant integrated into the Buffett Analyzer application.\n"
+    "The user is currently analyzing {ticker} with the following key metrics:\n\n"
+    "Financial Data:\n"
+    "- Net Income: {net_income}\n"
+    "- Sales: {sales}\n"
+    "- Owner Earnings: {owner_earnings}\n"
+    "- Look-Through Earnings: {look_through_earnings}\n"
+    "- Altman Z-Score: {altman_z}\n"
+    "- Capital Preservation Score: {capital_preservation}\n"
+    "- Buffett Score: {buffett_score}\n\n"
+    "Provide insightful financial analysis and answer questions about this company using Warren Buffett's "
+    "investment principles. Be specific and actionable; reference the provided metrics when relevant. "
+    "Keep responses concise but informative."
+)
+
+
+# Clients hold an httpx connection pool; share one per key across reruns and
+# sessions so keep-alive connections survive.
+@st.cache_resource(show_spinner=False)
+def _get_openai_client(api_key: str) -> OpenAI:
+    return OpenAI(api_key=api_key)
+
+
+@st.cache_resource(show_spinner=False)
+def _get_azure_client(api_key: str, endpoint: str, api_version: str):
+    return AzureOpenAI(
+        api_key=api_key,
+        azure_endpoint=endpoint,
+        api_version=api_version,
+    )
+
+
+# Styles for the chat modal; emitted on every render because Streamlit drops
+# elements that are not re-sent on a rerun.
+_CHAT_CSS = """
+    <style>
+    .chatgpt-modal { position: fixed; top: 5%; right: 2%; width: 480px; max-height: 86vh;
+        background: white; border: 2px solid #1f77b4; border-radius: 15px;
+        box-shadow: 0 8px 32px rgba(0,0,0,0.2); z-index: 1000; overflow: hidden; }
+    .chatgpt-header { background: linear-gradient(135deg, #1f77b4, #1565c0); color: white;
+        padding: 14px 18px; margin: 0; font-weight: 600; font-size: 16px; display:flex; justify-content:space-between; align-items:center; }
+    .chatgpt-content { padding: 14px 16px; max-height: 70vh; overflow-y: auto; }
+    .chat-message { margin: 10px 0; padding: 10px 12px; border-radius: 10px; font-size: 14px; line-height: 1.4; }
+    .user-message { background: #e3f2fd; border-left: 4px solid #2196f3; margin-left: 20px; }
+    .assistant-message { background: #f1f8e9; border-left: 4px solid #4caf50; margin-right: 20px; }
+    .stTextArea textarea { border-radius: 8px; border: 2px solid #e0e0e0; }
+    .stTextArea textarea:focus { border-color: #1f77b4; box-shadow: 0 0 0 1px #1f77b4; }
+    </style>
+    """
 
 
 # -----------------------------
@@ -101,6 +169,8 @@ class ChatGPTIntegration:
         self.azure_mode: bool = _is_azure_mode()
         self.client = self._build_client()
         self.chat_history: List[ChatMessage] = []
+        # Rolling API-format view of the last turns sent as context
+        self._messages_tail: Deque[Dict[str, str]] = deque(maxlen=6)
 
     # ---- configuration ----
     def _build_client(self):
@@ -114,13 +184,9 @@ class ChatGPTIntegration:
                 )
             endpoint = os.getenv("AZURE_OPENAI_ENDPOINT", "").strip()
             api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-06-01").strip()
-            return AzureOpenAI(
-                api_key=self.api_key,
-                azure_endpoint=endpoint,
-                api_version=api_version,
-            )
+            return _get_azure_client(self.api_key, endpoint, api_version)
         else:
-            return OpenAI(api_key=self.api_key)
+            return _get_openai_client(self.api_key)
 
     def is_configured(self) -> bool:
         return bool(self.api_key)
@@ -210,21 +276,7 @@ class ChatGPTIntegration:
 
     # ---- system context ----
     def add_system_context(self, ticker: str, company_data: Dict) -> str:
-        return (
-            "You are an expert financial analyst assistant integrated into the Buffett Analyzer application.\n"
-            f"The user is currently analyzing {ticker} with the following key metrics:\n\n"
-            "Financial Data:\n"
-            f"- Net Income: {company_data.get('net_income', 'N/A')}\n"
-            f"- Sales: {company_data.get('sales', 'N/A')}\n"
-            f"- Owner Earnings: {company_data.get('owner_earnings', 'N/A')}\n"
-            f"- Look-Through Earnings: {company_data.get('look_through_earnings', 'N/A')}\n"
-            f"- Altman Z-Score: {company_data.get('altman_z', 'N/A')}\n"
-            f"- Capital Preservation Score: {company_data.get('capital_preservation', 'N/A')}\n"
-            f"- Buffett Score: {company_data.get('buffett_score', 'N/A')}\n\n"
-            "Provide insightful financial analysis and answer questions about this company using Warren Buffett's "
-            "investment principles. Be specific and actionable; reference the provided metrics when relevant. "
-            "Keep responses concise but informative."
-        )
+        return _SYSTEM_CONTEXT_TMPL.format_map(_NA(company_data, ticker=ticker))
 
     # ---- core call ----
     def get_chatgpt_response(
@@ -241,11 +293,12 @@ class ChatGPTIntegration:
             return "OpenAI client not configured. Set OPENAI_API_KEY or Azure vars first."
 
         try:
-            messages = [{"role": "system", "content": self.add_system_context(ticker, company_data)}]
-            recent = self.chat_history[-6:] if len(self.chat_history) > 6 else self.chat_history
-            for msg in recent:
-                messages.append({"role": msg.role, "content": msg.content})
-            messages.append({"role": "user", "content": user_message})
+            user_entry = {"role": "user", "content": user_message}
+            messages = [
+                {"role": "system", "content": self.add_system_context(ticker, company_data)},
+                *self._messages_tail,
+                user_entry,
+            ]
 
             if self.azure_mode:
                 deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT", model or self.model).strip()
@@ -268,6 +321,8 @@ class ChatGPTIntegration:
 
             self.chat_history.append(ChatMessage("user", user_message, datetime.now()))
             self.chat_history.append(ChatMessage("assistant", assistant_message, datetime.now()))
+            self._messages_tail.append(user_entry)
+            self._messages_tail.append({"role": "assistant", "content": assistant_message})
 
             return assistant_message
 
@@ -296,13 +351,15 @@ class ChatGPTIntegration:
             {
                 "role": msg.role,
                 "content": msg.content,
-                "timestamp": msg.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                # Same "YYYY-MM-DD HH:MM:SS" text as strftime, without the format parser
+                "timestamp": msg.timestamp.isoformat(sep=" ", timespec="seconds"),
             }
             for msg in self.chat_history
         ]
 
     def clear_chat_history(self):
         self.chat_history = []
+        self._messages_tail.clear()
 
     def export_chat_to_text(self) -> str:
         if not self.chat_history:
@@ -317,6 +374,18 @@ class ChatGPTIntegration:
 # -----------------------------
 # --------- UI Modal ----------
 # -----------------------------
+def _chat_message_html(msg: ChatMessage) -> str:
+    if msg.role == "user":
+        css, role_icon = "user-message", "👤"
+    else:
+        css, role_icon = "assistant-message", "🤖"
+    return (
+        f'<div class="chat-message {css}">'
+        f"<small><strong>{role_icon} {msg.timestamp:%H:%M}</strong></small><br>{msg.content}"
+        "</div>"
+    )
+
+
 def render_chatgpt_modal(
     chat_integration: ChatGPTIntegration,
     ticker: str,
@@ -330,6 +399,7 @@ def render_chatgpt_modal(
     can be enabled by passing show_debug=True, or by setting SHOW_CHATGPT_DEBUG=True at
     module level. If show_debug is None, falls back to the module flag (False by default).
     """
+    # Closed is the common case on reruns: bail out before any other work
     if not st.session_state.get("show_chatgpt_modal", False):
         return
 
@@ -341,24 +411,7 @@ def render_chatgpt_modal(
         st.session_state.pop("chatgpt_input", None)
 
     # Basic CSS
-    st.markdown(
-        """
-    <style>
-    .chatgpt-modal { position: fixed; top: 5%; right: 2%; width: 480px; max-height: 86vh;
-        background: white; border: 2px solid #1f77b4; border-radius: 15px;
-        box-shadow: 0 8px 32px rgba(0,0,0,0.2); z-index: 1000; overflow: hidden; }
-    .chatgpt-header { background: linear-gradient(135deg, #1f77b4, #1565c0); color: white;
-        padding: 14px 18px; margin: 0; font-weight: 600; font-size: 16px; display:flex; justify-content:space-between; align-items:center; }
-    .chatgpt-content { padding: 14px 16px; max-height: 70vh; overflow-y: auto; }
-    .chat-message { margin: 10px 0; padding: 10px 12px; border-radius: 10px; font-size: 14px; line-height: 1.4; }
-    .user-message { background: #e3f2fd; border-left: 4px solid #2196f3; margin-left: 20px; }
-    .assistant-message { background: #f1f8e9; border-left: 4px solid #4caf50; margin-right: 20px; }
-    .stTextArea textarea { border-radius: 8px; border: 2px solid #e0e0e0; }
-    .stTextArea textarea:focus { border-color: #1f77b4; box-shadow: 0 0 0 1px #1f77b4; }
-    </style>
-    """,
-        unsafe_allow_html=True,
-    )
+    st.markdown(_CHAT_CSS, unsafe_allow_html=True)
 
     # Header row (title visible only when debugging)
     head_cols = st.columns([6, 1])
@@ -388,6 +441,7 @@ def render_chatgpt_modal(
         with cols[0]:
             if st.button("Save key", key="save_openai_key"):
                 if key_in.strip():
+                    _get_env_api_key.cache_clear()
                     chat_integration.set_api_key(key_in.strip())
                     st.success("Key saved in memory for this session.")
                     st.rerun()
@@ -415,18 +469,9 @@ def render_chatgpt_modal(
 
     st.markdown("#### Recent Conversation")
     if chat_integration.chat_history:
-        for msg in chat_integration.chat_history[-8:]:
-            css = "user-message" if msg.role == "user" else "assistant-message"
-            role_icon = "👤" if msg.role == "user" else "🤖"
-            ts = msg.timestamp.strftime("%H:%M")
-            st.markdown(
-                f"""
-            <div class="chat-message {css}">
-              <small><strong>{role_icon} {ts}</strong></small><br>{msg.content}
-            </div>
-            """,
-                unsafe_allow_html=True,
-            )
+        # One markdown element for the whole transcript instead of one per message
+        fragments = [_chat_message_html(msg) for msg in chat_integration.chat_history[-8:]]
+        st.markdown("".join(fragments), unsafe_allow_html=True)
     else:
         st.info(f"💡 Ask questions about {ticker}'s financial analysis!")
 
@@ -460,21 +505,23 @@ def render_chatgpt_modal(
                 pdf_filename = f"{ticker}_chatgpt_analysis_{ts}.pdf"
                 try:
                     buffett_metrics = {"circle_of_competence": "Evaluated"}
-                    pdf_path = export_enhanced_chat_pdf(
+                    # Render straight into memory; no temp file in the CWD
+                    buf = io.BytesIO()
+                    export_enhanced_chat_pdf_fast(
                         pdf_filename,
                         ticker,
                         chat_integration.get_chat_history_for_export(),
                         company_data,
                         buffett_metrics,
+                        output=buf,
+                    )
+                    st.download_button(
+                        "📥 Download PDF Report",
+                        buf.getvalue(),
+                        file_name=pdf_filename,
+                        mime="application/pdf",
+                        key="download_chat_pdf",
                     )
-                    with open(pdf_path, "rb") as f:
-                        st.download_button(
-                            "📥 Download PDF Report",
-                            f.read(),
-                            file_name=pdf_filename,
-                            mime="application/pdf",
-                            key="download_chat_pdf",
-                        )
                     st.success(f"✅ PDF report generated: {pdf_filename}")
                 except Exception as e:
                     st.error(f"Error creating PDF: {e}")
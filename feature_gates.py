@@ -1,22 +1,134 @@
 # feature_gates.py
 import streamlit as st
 from typing import List, Optional, Dict
-import pandas as pd
+
+# S&P 500 tickers (simplified list - you can expand this); built once at import.
+# A frozenset stays the right structure even for the full ~500-name index (tens
+# of KB, exact answers). Only a universe-sized list (~10k, cf.
+# exchange_ticker_list/symbols.csv) would justify a Bloom filter, and then hits
+# must be confirmed against an authoritative table since false positives would
+# unlock Premium tickers.
+SP500_TICKERS: frozenset = frozenset({
+    'AAPL', 'MSFT', 'AMZN', 'GOOGL', 'GOOG', 'TSLA', 'META', 'NVDA', 
+    'BRK.A', 'BRK.B', 'UNH', 'JNJ', 'JPM', 'V', 'PG', 'HD', 'CVX', 
+    'MA', 'PFE', 'ABBV', 'BAC', 'KO', 'PEP', 'COST', 'TMO', 'AVGO',
+    'WMT', 'DIS', 'ABT', 'CRM', 'DHR', 'VZ', 'ADBE', 'NEE', 'CMCSA',
+    'XOM', 'NKE', 'LIN', 'NFLX', 'QCOM', 'TXN', 'RTX', 'UPS', 'HON',
+    'LOW', 'IBM', 'SPGI', 'CAT', 'AXP', 'GS', 'BKNG', 'DE', 'INTU'
+})
+
+# Upsell panels shown by the simple premium/professional gates. The bullet
+# markdown is joined once at import so each panel is a single st.markdown call.
+_UPSELL_CONFIG: Dict[str, Dict] = {
+    "risk_metrics": {
+        "title": "### 🔒 Advanced Risk Analysis (Premium)",
+        "error": False,
+        "info": "**Max Drawdown & Volatility Analysis** helps assess capital preservation - a key Buffett principle",
+        "intro": "These metrics show:",
+        "bullets": [
+            "Worst historical price declines",
+            "Stock price stability over time",
+            "Risk-adjusted investment quality",
+        ],
+        "button": "🔓 Unlock Risk Metrics",
+        "button_key": "unlock_risk",
+    },
+    "look_through": {
+        "title": "### 🔒 Look-Through Earnings (Premium)",
+        "error": False,
+        "info": "**Look-Through Earnings** uses Buffett's 1991 methodology to analyze retained earnings from investees",
+        "intro": "This advanced technique:",
+        "bullets": [
+            "Factors in subsidiary earnings",
+            "Accounts for ownership percentages",
+            "Adjusts for tax implications",
+        ],
+        "button": "🔓 Unlock Look-Through",
+        "button_key": "unlock_lookthrough",
+    },
+    "contrarian": {
+        "title": "### 🔒 Contrarian Analysis (Premium)",
+        "error": False,
+        "info": "**Contrarian Overlay** factors in market sentiment for contrarian investment opportunities",
+        "intro": "Analyzes:",
+        "bullets": [
+            "Fear & Greed Index",
+            "Short interest levels",
+            "News sentiment",
+            "Put/Call ratios",
+        ],
+        "button": "🔓 Unlock Contrarian",
+        "button_key": "unlock_contrarian",
+    },
+    "greenwald": {
+        "title": "### 🔒 Greenwald Method (Professional)",
+        "error": False,
+        "info": "**Greenwald PPE/Sales method** provides advanced maintenance CapEx estimation using 5-year historical data",
+        "intro": "This sophisticated approach:",
+        "bullets": [
+            "Uses historical PPE/Sales ratios",
+            "Separates growth vs. maintenance CapEx",
+            "More accurate than simple D&A method",
+        ],
+        "button": "🔓 Unlock Greenwald",
+        "button_key": "unlock_greenwald",
+    },
+    "pdf_export": {
+        "title": "🔒 **PDF Export requires Premium subscription**",
+        "error": True,
+        "info": "Generate professional investment analysis reports with:",
+        "intro": "",
+        "bullets": [
+            "Complete financial analysis",
+            "Risk assessment charts",
+            "Buffett score breakdown",
+            "Executive summary",
+        ],
+        "button": "🔓 Unlock PDF Reports",
+        "button_key": "unlock_pdf",
+    },
+}
+for _cfg in _UPSELL_CONFIG.values():
+    _bullets = "\n".join(f"- {b}" for b in _cfg["bullets"])
+    _cfg["md"] = f"{_cfg['intro']}\n\n{_bullets}" if _cfg["intro"] else _bullets
+del _cfg, _bullets
+
+@st.cache_data(show_spinner=False)
+def _plan_comparison_df():
+    """Static plan comparison table; built once instead of on every rerun."""
+    import pandas as pd  # only this view needs pandas; keep it off the import path
+    
+    features_data = [
+        ["Company Analyses", "3 per week", "Unlimited", "Unlimited"],
+        ["Available Companies", "S&P 500 only", "All public companies", "All public companies"],
+        ["Owner Earnings", "✅ Basic", "✅ Full", "✅ Full"],
+        ["Circle of Competence", "3 sectors max", "Unlimited", "Unlimited"],
+        ["Altman Z-Score", "✅", "✅", "✅"],
+        ["Risk Metrics", "❌", "✅ Max DD, Volatility", "✅ All metrics"],
+        ["Look-Through Earnings", "❌", "✅", "✅"],
+        ["Contrarian Analysis", "❌", "✅", "✅"],
+        ["Maintenance CapEx", "D&A method", "D&A method", "✅ Greenwald method"],
+        ["AI Analysis", "❌", "5 queries/day", "Unlimited"],
+        ["PDF Reports", "❌", "✅", "✅"],
+        ["Bulk Analysis", "❌", "❌", "✅ CSV upload"],
+        ["API Access", "❌", "❌", "✅"],
+        ["Support", "Community", "Email support", "Priority support"],
+    ]
+    
+    return pd.DataFrame(features_data, columns=[
+        "Feature", 
+        "🆓 Free", 
+        "⭐ Premium ($49/mo)", 
+        "🏆 Professional ($149/mo)"
+    ])
+
 
 class FeatureGates:
     def __init__(self, quota_manager, auth_manager):
         self.quota_manager = quota_manager
         self.auth_manager = auth_manager
         
-        # S&P 500 tickers (simplified list - you can expand this)
-        self.sp500_tickers = {
-            'AAPL', 'MSFT', 'AMZN', 'GOOGL', 'GOOG', 'TSLA', 'META', 'NVDA', 
-            'BRK.A', 'BRK.B', 'UNH', 'JNJ', 'JPM', 'V', 'PG', 'HD', 'CVX', 
-            'MA', 'PFE', 'ABBV', 'BAC', 'KO', 'PEP', 'COST', 'TMO', 'AVGO',
-            'WMT', 'DIS', 'ABT', 'CRM', 'DHR', 'VZ', 'ADBE', 'NEE', 'CMCSA',
-            'XOM', 'NKE', 'LIN', 'NFLX', 'QCOM', 'TXN', 'RTX', 'UPS', 'HON',
-            'LOW', 'IBM', 'SPGI', 'CAT', 'AXP', 'GS', 'BKNG', 'DE', 'INTU'
-        }
+        self.sp500_tickers = SP500_TICKERS
     
     def check_analysis_permission(self, user_email: str, is_premium: bool, show_ui: bool = True) -> bool:
         """Check if user can start a new analysis"""
@@ -54,9 +166,9 @@ class FeatureGates:
         if is_premium:
             return True
         
-        ticker_upper = ticker.upper().strip()
+        ticker_upper = ticker.strip().upper()
         
-        if ticker_upper not in self.sp500_tickers:
+        if ticker_upper not in SP500_TICKERS:
             if show_ui:
                 st.error(f"🔒 **{ticker_upper} requires Premium subscription**")
                 
@@ -75,98 +187,45 @@ class FeatureGates:
         
         return True
     
-    def check_advanced_risk_metrics(self, is_premium: bool, show_ui: bool = True) -> bool:
-        """Gate advanced risk metrics (Max Drawdown, Volatility)"""
-        if is_premium:
+    def _gated(self, allowed: bool, feature: str, show_ui: bool) -> bool:
+        """Return True if allowed; otherwise optionally render the feature's upsell panel"""
+        if allowed:
             return True
         
         if show_ui:
-            st.markdown("### 🔒 Advanced Risk Analysis (Premium)")
+            cfg = _UPSELL_CONFIG[feature]
+            if cfg["error"]:
+                st.error(cfg["title"])
+            else:
+                st.markdown(cfg["title"])
             
             col1, col2 = st.columns([2, 1])
             with col1:
-                st.info("**Max Drawdown & Volatility Analysis** helps assess capital preservation - a key Buffett principle")
-                st.markdown("These metrics show:")
-                st.markdown("- Worst historical price declines")
-                st.markdown("- Stock price stability over time") 
-                st.markdown("- Risk-adjusted investment quality")
+                st.info(cfg["info"])
+                st.markdown(cfg["md"])
             
             with col2:
-                if st.button("🔓 Unlock Risk Metrics", key="unlock_risk"):
+                if st.button(cfg["button"], key=cfg["button_key"]):
                     st.session_state["show_upgrade_modal"] = True
                     st.rerun()
         
         return False
     
+    def check_advanced_risk_metrics(self, is_premium: bool, show_ui: bool = True) -> bool:
+        """Gate advanced risk metrics (Max Drawdown, Volatility)"""
+        return self._gated(is_premium, "risk_metrics", show_ui)
+    
     def check_look_through_earnings(self, is_premium: bool, show_ui: bool = True) -> bool:
         """Gate Look-Through Earnings calculation (Buffett 1991)"""
-        if is_premium:
-            return True
-        
-        if show_ui:
-            st.markdown("### 🔒 Look-Through Earnings (Premium)")
-            
-            col1, col2 = st.columns([2, 1])
-            with col1:
-                st.info("**Look-Through Earnings** uses Buffett's 1991 methodology to analyze retained earnings from investees")
-                st.markdown("This advanced technique:")
-                st.markdown("- Factors in subsidiary earnings")
-                st.markdown("- Accounts for ownership percentages")
-                st.markdown("- Adjusts for tax implications")
-            
-            with col2:
-                if st.button("🔓 Unlock Look-Through", key="unlock_lookthrough"):
-                    st.session_state["show_upgrade_modal"] = True
-                    st.rerun()
-        
-        return False
+        return self._gated(is_premium, "look_through", show_ui)
     
     def check_contrarian_overlay(self, is_premium: bool, show_ui: bool = True) -> bool:
         """Gate contrarian sentiment analysis"""
-        if is_premium:
-            return True
-        
-        if show_ui:
-            st.markdown("### 🔒 Contrarian Analysis (Premium)")
-            
-            col1, col2 = st.columns([2, 1])
-            with col1:
-                st.info("**Contrarian Overlay** factors in market sentiment for contrarian investment opportunities")
-                st.markdown("Analyzes:")
-                st.markdown("- Fear & Greed Index")
-                st.markdown("- Short interest levels")
-                st.markdown("- News sentiment")
-                st.markdown("- Put/Call ratios")
-            
-            with col2:
-                if st.button("🔓 Unlock Contrarian", key="unlock_contrarian"):
-                    st.session_state["show_upgrade_modal"] = True
-                    st.rerun()
-        
-        return False
+        return self._gated(is_premium, "contrarian", show_ui)
     
     def check_greenwald_method(self, is_professional: bool, show_ui: bool = True) -> bool:
         """Gate Greenwald maintenance CapEx method"""
-        if is_professional:
-            return True
-        
-        if show_ui:
-            st.markdown("### 🔒 Greenwald Method (Professional)")
-            
-            col1, col2 = st.columns([2, 1])
-            with col1:
-                st.info("**Greenwald PPE/Sales method** provides advanced maintenance CapEx estimation using 5-year historical data")
-                st.markdown("This sophisticated approach:")
-                st.markdown("- Uses historical PPE/Sales ratios")
-                st.markdown("- Separates growth vs. maintenance CapEx")
-                st.markdown("- More accurate than simple D&A method")
-            
-            with col2:
-                if st.button("🔓 Unlock Greenwald", key="unlock_greenwald"):
-                    st.session_state["show_upgrade_modal"] = True
-                    st.rerun()
-        
-        return False
+        return self._gated(is_professional, "greenwald", show_ui)
     
     def check_chatgpt_access(self, user_email: str, is_premium: bool, is_professional: bool, show_ui: bool = True) -> bool:
         """Gate ChatGPT AI analysis"""
@@ -212,57 +271,14 @@ class FeatureGates:
     
     def check_pdf_export(self, is_premium: bool, show_ui: bool = True) -> bool:
         """Gate PDF report export"""
-        if is_premium:
-            return True
-        
-        if show_ui:
-            st.error("🔒 **PDF Export requires Premium subscription**")
-            
-            col1, col2 = st.columns([2, 1])
-            with col1:
-                st.info("Generate professional investment analysis reports with:")
-                st.markdown("- Complete financial analysis")
-                st.markdown("- Risk assessment charts")
-                st.markdown("- Buffett score breakdown")
-                st.markdown("- Executive summary")
-            
-            with col2:
-                if st.button("🔓 Unlock PDF Reports", key="unlock_pdf"):
-                    st.session_state["show_upgrade_modal"] = True
-                    st.rerun()
-        
-        return False
+        return self._gated(is_premium, "pdf_export", show_ui)
     
     def show_feature_comparison_table(self):
         """Display feature comparison table"""
         st.markdown("### 📊 Plan Comparison")
         
-        features_data = [
-            ["Company Analyses", "3 per week", "Unlimited", "Unlimited"],
-            ["Available Companies", "S&P 500 only", "All public companies", "All public companies"],
-            ["Owner Earnings", "✅ Basic", "✅ Full", "✅ Full"],
-            ["Circle of Competence", "3 sectors max", "Unlimited", "Unlimited"],
-            ["Altman Z-Score", "✅", "✅", "✅"],
-            ["Risk Metrics", "❌", "✅ Max DD, Volatility", "✅ All metrics"],
-            ["Look-Through Earnings", "❌", "✅", "✅"],
-            ["Contrarian Analysis", "❌", "✅", "✅"],
-            ["Maintenance CapEx", "D&A method", "D&A method", "✅ Greenwald method"],
-            ["AI Analysis", "❌", "5 queries/day", "Unlimited"],
-            ["PDF Reports", "❌", "✅", "✅"],
-            ["Bulk Analysis", "❌", "❌", "✅ CSV upload"],
-            ["API Access", "❌", "❌", "✅"],
-            ["Support", "Community", "Email support", "Priority support"],
-        ]
-        
-        df = pd.DataFrame(features_data, columns=[
-            "Feature", 
-            "🆓 Free", 
-            "⭐ Premium ($49/mo)", 
-            "🏆 Professional ($149/mo)"
-        ])
-        
         # Style the dataframe
-        st.dataframe(df, use_container_width=True, hide_index=True)
+        st.dataframe(_plan_comparison_df(), use_container_width=True, hide_index=True)
     
     def check_circle_of_competence_limit(self, selected_items: List[str], is_premium: bool) -> bool:
         """Check if user exceeds circle of competence selection limit"""
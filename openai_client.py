@@ -1,7 +1,10 @@
 # openai_client.py
 from __future__ import annotations
 
+import hashlib
 import os
+import time
+from functools import lru_cache
 from typing import Optional
 
 from dotenv import load_dotenv
@@ -20,6 +23,7 @@ from openai._exceptions import AuthenticationError, APIConnectionError, NotFound
 load_dotenv(override=False)
 
 
+@lru_cache(maxsize=1)
 def _get_api_key() -> Optional[str]:
     # Priority: explicit env var, then streamlit secrets (if present)
     key = os.getenv("OPENAI_API_KEY")
@@ -42,7 +46,13 @@ def _mask(s: str, keep: int = 4) -> str:
     return f"{'*' * max(0, len(s) - keep)}{s[-keep:]}"
 
 
+@lru_cache(maxsize=1)
 def get_openai_client() -> OpenAI:
+    """
+    Process-wide client: reusing it keeps one httpx connection pool (and its
+    keep-alive TLS connections) instead of a fresh handshake per call.
+    Call reset_openai_client() after rotating the key.
+    """
     api_key = _get_api_key()
     if not api_key:
         raise RuntimeError(
@@ -55,11 +65,27 @@ def get_openai_client() -> OpenAI:
     return client
 
 
+def reset_openai_client() -> None:
+    """Drop the cached key and client so the next call re-reads env/secrets."""
+    _get_api_key.cache_clear()
+    get_openai_client.cache_clear()
+    _ping.cache_clear()
+
+
 def quick_ping(model: str = "gpt-4o-mini") -> str:
     """
     Small request to verify the key is valid and the model is reachable.
     Returns the assistant's one-line reply or raises a helpful exception.
+    A successful reply is reused for the rest of the current minute.
     """
+    key_fingerprint = hashlib.sha256((_get_api_key() or "").encode()).hexdigest()[:16]
+    return _ping(model, key_fingerprint, int(time.time() // 60))
+
+
+# lru_cache only stores returned values, so failed pings are retried next call.
+# The key fingerprint keeps a rotated key from reusing the old key's result.
+@lru_cache(maxsize=8)
+def _ping(model: str, key_fingerprint: str, minute_bucket: int) -> str:
     client = get_openai_client()
 
     try:
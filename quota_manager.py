@@ -1,11 +1,106 @@
 # quota_manager.py
+import logging
+import os
 import sqlite3
-from datetime import datetime, date, timedelta
-from typing import Dict, List, Optional
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from users_db import ConnectionPool, get_pool
+
+logger = logging.getLogger(__name__)
+
+
+# Calendar helpers for the reset checks. The bucket argument (current minute)
+# keys the one-entry cache, so the date math runs at most once per minute.
+# They return ISO strings: stored reset dates are ISO too and sort the same
+# way as text, so the checks are plain string comparisons.
+def _minute_bucket() -> int:
+    return int(time.time() // 60)
+
+
+@lru_cache(maxsize=1)
+def _today_iso(bucket: int) -> str:
+    return date.today().isoformat()
+
+
+@lru_cache(maxsize=1)
+def _this_monday_iso(bucket: int) -> str:
+    today = date.today()
+    return (today - timedelta(days=today.weekday())).isoformat()  # Monday = 0
+
 
 class QuotaManager:
-    def __init__(self):
-        self.db_path = "buffett_users.db"
+    # SQL kept as constants so every call passes the identical string and hits
+    # the per-connection statement cache.
+    SELECT_ANALYSIS_QUOTA_SQL = "SELECT analysis_count_weekly, last_weekly_reset FROM users WHERE email = ?"
+    # Counter resets. The WHERE clause makes each a no-op unless the last reset
+    # predates this Monday / today (ISO dates compare correctly as text), so an
+    # up-to-date row is never rewritten and concurrent sessions cannot reset twice.
+    # Every path that bumps a counter runs the matching reset first, in the same
+    # transaction, because the quota check it follows may have come from the cache.
+    RESET_WEEKLY_IF_DUE_SQL = """UPDATE users SET analysis_count_weekly = 0, last_weekly_reset = :today
+                   WHERE email = :email AND (last_weekly_reset IS NULL OR last_weekly_reset < :this_monday)"""
+    RESET_DAILY_IF_DUE_SQL = """UPDATE users SET chatgpt_count_daily = 0, last_daily_reset = :today
+                   WHERE email = :email AND (last_daily_reset IS NULL OR last_daily_reset < :today)"""
+    INCREMENT_ANALYSIS_SQL = "UPDATE users SET analysis_count_weekly = analysis_count_weekly + 1 WHERE email = ?"
+    INSERT_HISTORY_SQL = """INSERT INTO analysis_history 
+                   (user_email, ticker, analysis_type, buffett_score, owner_earnings) 
+                   VALUES (?, ?, 'standard', ?, ?)"""
+    BULK_INCREMENT_ANALYSIS_SQL = "UPDATE users SET analysis_count_weekly = analysis_count_weekly + ? WHERE email = ?"
+    INSERT_BULK_HISTORY_SQL = """INSERT INTO analysis_history 
+                   (user_email, ticker, analysis_type, buffett_score, owner_earnings) 
+                   VALUES (?, ?, 'bulk', ?, ?)"""
+    SELECT_CHATGPT_QUOTA_SQL = "SELECT chatgpt_count_daily, last_daily_reset FROM users WHERE email = ?"
+    INCREMENT_CHATGPT_SQL = "UPDATE users SET chatgpt_count_daily = chatgpt_count_daily + 1 WHERE email = ?"
+    # Usage counters, lifetime total and the 5 most recent analyses in one round-trip.
+    # Yields one row per recent analysis (or a single row with NULL history columns).
+    SELECT_USAGE_SQL = """SELECT u.analysis_count_weekly, u.last_weekly_reset,
+                          u.chatgpt_count_daily, u.last_daily_reset, u.subscription_tier,
+                          (SELECT COUNT(*) FROM analysis_history WHERE user_email = u.email) AS total,
+                          ah.ticker, ah.buffett_score, ah.created_at
+                   FROM users u
+                   LEFT JOIN (SELECT user_email, ticker, buffett_score, created_at FROM analysis_history
+                              WHERE user_email = ? ORDER BY created_at DESC LIMIT 5) ah
+                          ON ah.user_email = u.email
+                   WHERE u.email = ?
+                   ORDER BY ah.created_at DESC"""
+    RESERVE_ANALYSIS_SQL = """UPDATE users SET analysis_count_weekly = analysis_count_weekly + 1
+                   WHERE email = ? AND analysis_count_weekly < ?"""
+    RELEASE_ANALYSIS_SQL = "UPDATE users SET analysis_count_weekly = MAX(0, analysis_count_weekly - 1) WHERE email = ?"
+    RESERVE_CHATGPT_SQL = """UPDATE users SET chatgpt_count_daily = chatgpt_count_daily + 1
+                   WHERE email = ? AND chatgpt_count_daily < ?"""
+    RELEASE_CHATGPT_SQL = "UPDATE users SET chatgpt_count_daily = MAX(0, chatgpt_count_daily - 1) WHERE email = ?"
+    RESET_QUOTAS_SQL = """UPDATE users 
+                   SET analysis_count_weekly = 0, chatgpt_count_daily = 0,
+                       last_weekly_reset = ?, last_daily_reset = ?
+                   WHERE email = ?"""
+
+    # Covering index: the recent-analyses subquery and its COUNT(*) are answered
+    # from the index alone, without a sort or a table lookup.
+    CREATE_HISTORY_INDEX_SQL = """CREATE INDEX IF NOT EXISTS idx_ah_covering
+                   ON analysis_history(user_email, created_at DESC, ticker, buffett_score)"""
+    # Every quota lookup is `WHERE email = ?`; make sure that is an index seek.
+    CREATE_USERS_EMAIL_INDEX_SQL = "CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users(email)"
+
+    # Quota checks run on every Streamlit rerun; serve them from memory for a
+    # short while. Increments/resets bump the per-user version, and the TTL
+    # covers day/week rollovers.
+    QUOTA_CACHE_TTL = 30  # seconds
+
+    # Database files whose indexes have already been attempted in this process.
+    _indexed_paths: set = set()
+
+    def __init__(self, db_path: Optional[str] = None):
+        """db_path defaults to $DATABASE_PATH (as SubscriptionManager), else buffett_users.db.
+
+        Tests can pass a temp file or ":memory:" (one database per process).
+        """
+        self.db_path = db_path or os.getenv("DATABASE_PATH", "buffett_users.db")
+        self._quota_cache: Dict[Tuple, Tuple[float, int, Dict]] = {}
+        self._ver: Dict[str, int] = defaultdict(int)
         self.free_limits = {
             'weekly_analyses': 3,
             'daily_chatgpt': 0,  # No ChatGPT for free users
@@ -14,221 +109,316 @@ class QuotaManager:
             'daily_chatgpt': 5,
         }
     
+    def _pool(self) -> ConnectionPool:
+        """The process-wide users_db pool for this file (shared with SubscriptionManager).
+        
+        Streamlit runs every rerun on a new thread, so connections are pooled per
+        process rather than kept per thread.
+        """
+        pool = get_pool(self.db_path)
+        if self.db_path not in QuotaManager._indexed_paths:
+            with pool.acquire(write=True) as conn:
+                self._ensure_indexes(conn)
+        return pool
+    
+    def _transaction(self):
+        """Explicit write transaction on the pool's writer connection."""
+        return self._pool().transaction()
+    
+    def _ensure_indexes(self, conn: sqlite3.Connection):
+        """Indexes backing the per-user lookups (attempted once per database file).
+
+        A failure (e.g. the tables do not exist yet) is logged and not retried,
+        so quota calls do not retake the writer lock and re-run the DDL each time.
+        """
+        if self.db_path in QuotaManager._indexed_paths:
+            return
+        QuotaManager._indexed_paths.add(self.db_path)
+        try:
+            conn.execute(self.CREATE_HISTORY_INDEX_SQL)
+            if not self._email_is_unique(conn):
+                conn.execute(self.CREATE_USERS_EMAIL_INDEX_SQL)
+        except sqlite3.Error as e:
+            logger.error("Error creating quota indexes: %s", e)
+    
+    @staticmethod
+    def _email_is_unique(conn: sqlite3.Connection) -> bool:
+        """True if users.email is the PK or carries a single-column UNIQUE index."""
+        for idx in conn.execute("PRAGMA index_list(users)"):
+            if not idx["unique"]:
+                continue
+            cols = [c["name"] for c in conn.execute(f"PRAGMA index_info(\"{idx['name']}\")")]
+            if cols == ["email"]:
+                return True
+        pk = [c["name"] for c in conn.execute("PRAGMA table_info(users)") if c["pk"]]
+        return pk == ["email"]
+    
+    def _cached_quota(self, key: Tuple) -> Optional[Dict]:
+        hit = self._quota_cache.get(key)
+        if hit is None:
+            return None
+        ts, ver, result = hit
+        if time.monotonic() - ts >= self.QUOTA_CACHE_TTL or ver != self._ver[key[0]]:
+            return None
+        return dict(result)
+    
+    def _store_quota(self, key: Tuple, ver: int, result: Dict) -> Dict:
+        self._quota_cache[key] = (time.monotonic(), ver, result)
+        return dict(result)
+    
+    def _invalidate_quota(self, user_email: str):
+        self._ver[user_email] += 1
+    
+    @staticmethod
+    def _reset_params(user_email: str) -> Dict[str, str]:
+        """Named parameters for RESET_WEEKLY_IF_DUE_SQL / RESET_DAILY_IF_DUE_SQL"""
+        return {
+            "this_monday": _this_monday_iso(_minute_bucket()),
+            "today": _today_iso(_minute_bucket()),
+            "email": user_email,
+        }
+    
     def check_analysis_quota(self, user_email: str, is_premium: bool) -> Dict:
         """Check weekly analysis quota for user"""
         if is_premium:
             return {"allowed": True, "remaining": "unlimited", "limit": "unlimited"}
         
-        conn = sqlite3.connect(self.db_path)
+        key = (user_email, "weekly")
+        cached = self._cached_quota(key)
+        if cached is not None:
+            return cached
+        ver = self._ver[user_email]
+        
         try:
-            user = conn.execute(
-                "SELECT analysis_count_weekly, last_weekly_reset FROM users WHERE email = ?",
-                (user_email,)
-            ).fetchone()
+            pool = self._pool()
+            with pool.acquire() as conn:
+                user = conn.execute(self.SELECT_ANALYSIS_QUOTA_SQL, (user_email,)).fetchone()
             
             if not user:
                 return {"allowed": False, "remaining": 0, "limit": self.free_limits['weekly_analyses']}
             
-            count, last_reset = user[0], user[1]
+            count = user["analysis_count_weekly"]
             
-            # Reset weekly counter if needed (every Monday)
-            if self._should_reset_weekly(last_reset):
-                count = 0
-                conn.execute(
-                    "UPDATE users SET analysis_count_weekly = 0, last_weekly_reset = ? WHERE email = ?",
-                    (date.today().isoformat(), user_email)
-                )
-                conn.commit()
+            # Reset weekly counter if needed (every Monday); a plain read otherwise
+            if self._should_reset_weekly(user["last_weekly_reset"]):
+                with pool.acquire(write=True) as conn:
+                    if conn.execute(self.RESET_WEEKLY_IF_DUE_SQL, self._reset_params(user_email)).rowcount:
+                        count = 0
+                    else:  # another session reset it (and may have used a slot) first
+                        count = conn.execute(self.SELECT_ANALYSIS_QUOTA_SQL, (user_email,)).fetchone()["analysis_count_weekly"]
             
             limit = self.free_limits['weekly_analyses']
             remaining = max(0, limit - count)
             
-            return {
+            return self._store_quota(key, ver, {
                 "allowed": count < limit,
                 "remaining": remaining,
                 "limit": limit,
                 "used": count
-            }
+            })
         except Exception as e:
-            print(f"Error checking analysis quota: {e}")
+            logger.error("Error checking analysis quota: %s", e)
             return {"allowed": False, "remaining": 0, "limit": self.free_limits['weekly_analyses']}
+    
+    def try_reserve_analysis(self, user_email: str) -> bool:
+        """Atomically take one weekly analysis slot (free tier) before running the analysis.
+        
+        Returns False if the limit is already reached. Call release_analysis() if
+        the analysis then fails, or increment_analysis_usage(..., reserved=True)
+        to record it.
+        """
+        try:
+            with self._transaction() as conn:
+                conn.execute(self.RESET_WEEKLY_IF_DUE_SQL, self._reset_params(user_email))
+                cur = conn.execute(self.RESERVE_ANALYSIS_SQL, (user_email, self.free_limits['weekly_analyses']))
+            return cur.rowcount == 1
+        except Exception as e:
+            logger.error("Error reserving analysis quota: %s", e)
+            return False
         finally:
-            conn.close()
+            self._invalidate_quota(user_email)
     
-    def increment_analysis_usage(self, user_email: str, ticker: str = "", buffett_score: float = 0.0, owner_earnings: float = 0.0):
-        """Increment weekly analysis counter and save to history"""
-        conn = sqlite3.connect(self.db_path)
+    def release_analysis(self, user_email: str):
+        """Give back a slot taken by try_reserve_analysis()"""
         try:
-            # Increment weekly counter
-            conn.execute(
-                "UPDATE users SET analysis_count_weekly = analysis_count_weekly + 1 WHERE email = ?",
-                (user_email,)
-            )
-            
-            # Save to analysis history
-            conn.execute(
-                """INSERT INTO analysis_history 
-                   (user_email, ticker, analysis_type, buffett_score, owner_earnings) 
-                   VALUES (?, ?, 'standard', ?, ?)""",
-                (user_email, ticker, buffett_score, owner_earnings)
-            )
-            
-            conn.commit()
-            print(f"✅ Analysis usage incremented for {user_email}: {ticker}")
+            with self._pool().acquire(write=True) as conn:
+                conn.execute(self.RELEASE_ANALYSIS_SQL, (user_email,))
         except Exception as e:
-            print(f"Error incrementing analysis usage: {e}")
+            logger.error("Error releasing analysis quota: %s", e)
         finally:
-            conn.close()
+            self._invalidate_quota(user_email)
+    
+    def increment_analysis_usage(self, user_email: str, ticker: str = "", buffett_score: float = 0.0, owner_earnings: float = 0.0,
+                                 reserved: bool = False):
+        """Increment weekly analysis counter and save to history
+        
+        Pass reserved=True when the slot was already taken via try_reserve_analysis();
+        only the history row is written then.
+        """
+        try:
+            # Counter + history row commit together (one write transaction, one sync)
+            with self._transaction() as conn:
+                # Increment weekly counter
+                if not reserved:
+                    conn.execute(self.RESET_WEEKLY_IF_DUE_SQL, self._reset_params(user_email))
+                    conn.execute(self.INCREMENT_ANALYSIS_SQL, (user_email,))
+                
+                # Save to analysis history
+                conn.execute(self.INSERT_HISTORY_SQL, (user_email, ticker, buffett_score, owner_earnings))
+            self._invalidate_quota(user_email)
+            
+            logger.debug("Analysis usage incremented for %s: %s", user_email, ticker)
+        except Exception as e:
+            logger.error("Error incrementing analysis usage: %s", e)
+    
+    def bulk_increment_analysis(self, user_email: str, rows: List[Tuple[str, float, float]]):
+        """Record a batch of analyses (Professional CSV upload) in one transaction
+        
+        rows: (ticker, buffett_score, owner_earnings) per analysed company.
+        """
+        if not rows:
+            return
+        try:
+            with self._transaction() as conn:
+                conn.execute(self.RESET_WEEKLY_IF_DUE_SQL, self._reset_params(user_email))
+                conn.execute(self.BULK_INCREMENT_ANALYSIS_SQL, (len(rows), user_email))
+                conn.executemany(self.INSERT_BULK_HISTORY_SQL,
+                                 [(user_email, t, score, oe) for t, score, oe in rows])
+            self._invalidate_quota(user_email)
+            
+            logger.debug("Bulk analysis usage incremented for %s: %s tickers", user_email, len(rows))
+        except Exception as e:
+            logger.error("Error incrementing bulk analysis usage: %s", e)
     
     def check_chatgpt_quota(self, user_email: str, is_premium: bool, is_professional: bool) -> Dict:
         """Check daily ChatGPT quota for user"""
         if is_professional:
             return {"allowed": True, "remaining": "unlimited", "limit": "unlimited"}
+        if not is_premium:
+            # No ChatGPT on the free tier; nothing to read from the database
+            return {"allowed": False, "remaining": 0, "limit": self.free_limits['daily_chatgpt']}
+        
+        key = (user_email, "daily")
+        cached = self._cached_quota(key)
+        if cached is not None:
+            return cached
+        ver = self._ver[user_email]
         
-        conn = sqlite3.connect(self.db_path)
         try:
-            user = conn.execute(
-                "SELECT chatgpt_count_daily, last_daily_reset FROM users WHERE email = ?",
-                (user_email,)
-            ).fetchone()
+            pool = self._pool()
+            with pool.acquire() as conn:
+                user = conn.execute(self.SELECT_CHATGPT_QUOTA_SQL, (user_email,)).fetchone()
             
             if not user:
                 return {"allowed": False, "remaining": 0, "limit": 0}
             
-            count, last_reset = user[0], user[1]
+            count, last_reset = user["chatgpt_count_daily"], user["last_daily_reset"]
             
             # Reset daily counter if needed
             if self._should_reset_daily(last_reset):
-                count = 0
-                conn.execute(
-                    "UPDATE users SET chatgpt_count_daily = 0, last_daily_reset = ? WHERE email = ?",
-                    (date.today().isoformat(), user_email)
-                )
-                conn.commit()
-            
-            if not is_premium:
-                return {"allowed": False, "remaining": 0, "limit": 0}
+                with pool.acquire(write=True) as conn:
+                    if conn.execute(self.RESET_DAILY_IF_DUE_SQL, self._reset_params(user_email)).rowcount:
+                        count = 0
+                    else:  # another session reset it (and may have used a query) first
+                        count = conn.execute(self.SELECT_CHATGPT_QUOTA_SQL, (user_email,)).fetchone()["chatgpt_count_daily"]
             
             limit = self.premium_limits['daily_chatgpt']
             remaining = max(0, limit - count)
             
-            return {
+            return self._store_quota(key, ver, {
                 "allowed": count < limit,
                 "remaining": remaining,
                 "limit": limit,
                 "used": count
-            }
+            })
         except Exception as e:
-            print(f"Error checking ChatGPT quota: {e}")
+            logger.error("Error checking ChatGPT quota: %s", e)
             return {"allowed": False, "remaining": 0, "limit": 0}
+    
+    def try_reserve_chatgpt(self, user_email: str) -> bool:
+        """Atomically take one daily ChatGPT query (premium tier) before calling the API.
+        
+        Returns False if the limit is already reached. Call release_chatgpt() if
+        the request then fails; no increment_chatgpt_usage() call is needed.
+        """
+        try:
+            with self._transaction() as conn:
+                conn.execute(self.RESET_DAILY_IF_DUE_SQL, self._reset_params(user_email))
+                cur = conn.execute(self.RESERVE_CHATGPT_SQL, (user_email, self.premium_limits['daily_chatgpt']))
+            return cur.rowcount == 1
+        except Exception as e:
+            logger.error("Error reserving ChatGPT quota: %s", e)
+            return False
+        finally:
+            self._invalidate_quota(user_email)
+    
+    def release_chatgpt(self, user_email: str):
+        """Give back a query taken by try_reserve_chatgpt()"""
+        try:
+            with self._pool().acquire(write=True) as conn:
+                conn.execute(self.RELEASE_CHATGPT_SQL, (user_email,))
+        except Exception as e:
+            logger.error("Error releasing ChatGPT quota: %s", e)
         finally:
-            conn.close()
+            self._invalidate_quota(user_email)
     
     def increment_chatgpt_usage(self, user_email: str):
         """Increment daily ChatGPT counter"""
-        conn = sqlite3.connect(self.db_path)
         try:
-            conn.execute(
-                "UPDATE users SET chatgpt_count_daily = chatgpt_count_daily + 1 WHERE email = ?",
-                (user_email,)
-            )
-            conn.commit()
-            print(f"✅ ChatGPT usage incremented for {user_email}")
+            with self._transaction() as conn:
+                conn.execute(self.RESET_DAILY_IF_DUE_SQL, self._reset_params(user_email))
+                conn.execute(self.INCREMENT_CHATGPT_SQL, (user_email,))
+            self._invalidate_quota(user_email)
+            logger.debug("ChatGPT usage incremented for %s", user_email)
         except Exception as e:
-            print(f"Error incrementing ChatGPT usage: {e}")
-        finally:
-            conn.close()
+            logger.error("Error incrementing ChatGPT usage: %s", e)
     
     def get_user_usage_summary(self, user_email: str) -> Dict:
         """Get comprehensive usage summary for a user"""
-        conn = sqlite3.connect(self.db_path)
         try:
-            # Get current usage
-            user = conn.execute(
-                """SELECT analysis_count_weekly, last_weekly_reset, 
-                          chatgpt_count_daily, last_daily_reset, subscription_tier 
-                   FROM users WHERE email = ?""",
-                (user_email,)
-            ).fetchone()
+            with self._pool().acquire() as conn:
+                rows = conn.execute(self.SELECT_USAGE_SQL, (user_email, user_email)).fetchall()
             
-            if not user:
+            if not rows:
                 return {}
             
-            analysis_count, weekly_reset, chatgpt_count, daily_reset, tier = user
+            user = rows[0]
+            total_analyses = user["total"]
             
-            # Get total historical analyses
-            total_analyses = conn.execute(
-                "SELECT COUNT(*) FROM analysis_history WHERE user_email = ?",
-                (user_email,)
-            ).fetchone()[0]
-            
-            # Get recent analyses
-            recent_analyses = conn.execute(
-                """SELECT ticker, buffett_score, created_at FROM analysis_history 
-                   WHERE user_email = ? ORDER BY created_at DESC LIMIT 5""",
-                (user_email,)
-            ).fetchall()
+            # With no history the LEFT JOIN yields one all-NULL history row
+            recent_analyses = rows if total_analyses else []
             
             return {
-                'current_week_analyses': analysis_count,
-                'current_day_chatgpt': chatgpt_count,
+                'current_week_analyses': user["analysis_count_weekly"],
+                'current_day_chatgpt': user["chatgpt_count_daily"],
                 'total_analyses_ever': total_analyses,
-                'subscription_tier': tier,
+                'subscription_tier': user["subscription_tier"],
                 'recent_analyses': [
-                    {'ticker': r[0], 'score': r[1], 'date': r[2]} 
+                    {'ticker': r["ticker"], 'score': r["buffett_score"], 'date': r["created_at"]} 
                     for r in recent_analyses
                 ],
-                'weekly_reset_due': self._should_reset_weekly(weekly_reset),
-                'daily_reset_due': self._should_reset_daily(daily_reset)
+                'weekly_reset_due': self._should_reset_weekly(user["last_weekly_reset"]),
+                'daily_reset_due': self._should_reset_daily(user["last_daily_reset"])
             }
         except Exception as e:
-            print(f"Error getting usage summary: {e}")
+            logger.error("Error getting usage summary: %s", e)
             return {}
-        finally:
-            conn.close()
     
     def _should_reset_weekly(self, last_reset: str) -> bool:
         """Check if weekly counter should reset (every Monday)"""
-        if not last_reset:
-            return True
-        
-        try:
-            last_date = datetime.fromisoformat(last_reset).date()
-            today = date.today()
-            
-            # Find Monday of this week
-            days_since_monday = today.weekday()  # Monday = 0
-            this_monday = today - timedelta(days=days_since_monday)
-            
-            return last_date < this_monday
-        except:
-            return True
+        return (not last_reset) or last_reset < _this_monday_iso(_minute_bucket())
     
     def _should_reset_daily(self, last_reset: str) -> bool:
         """Check if daily counter should reset"""
-        if not last_reset:
-            return True
-        
-        try:
-            last_date = datetime.fromisoformat(last_reset).date()
-            return last_date < date.today()
-        except:
-            return True
+        return (not last_reset) or last_reset < _today_iso(_minute_bucket())
     
     def reset_user_quotas(self, user_email: str):
         """Manually reset user quotas (admin function)"""
-        conn = sqlite3.connect(self.db_path)
         try:
-            conn.execute(
-                """UPDATE users 
-                   SET analysis_count_weekly = 0, chatgpt_count_daily = 0,
-                       last_weekly_reset = ?, last_daily_reset = ?
-                   WHERE email = ?""",
-                (date.today().isoformat(), date.today().isoformat(), user_email)
-            )
-            conn.commit()
-            print(f"✅ Quotas reset for {user_email}")
+            today = _today_iso(_minute_bucket())
+            with self._pool().acquire(write=True) as conn:
+                conn.execute(self.RESET_QUOTAS_SQL, (today, today, user_email))
+            self._invalidate_quota(user_email)
+            logger.debug("Quotas reset for %s", user_email)
         except Exception as e:
-            print(f"Error resetting quotas: {e}")
-        finally:
-            conn.close()
\ No newline at end of file
+            logger.error("Error resetting quotas: %s", e)
\ No newline at end of file
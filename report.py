@@ -1,13 +1,36 @@
 # report.py
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
+# reportlab is imported lazily: it is only needed once a user exports a PDF.
 from datetime import datetime
+from functools import lru_cache
 
-def export_pdf(filename, company_name, buffett_score, metrics: dict):
+
+@lru_cache(maxsize=1)
+def _pdf_styles():
+    """Stylesheet and table style are read-only once built; share them across exports."""
+    from reportlab.platypus import TableStyle
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib import colors
+
+    header_bg = colors.HexColor("#d9e6f2")
+    table_style = TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), header_bg),
+        ('TEXTCOLOR',(0,0),(-1,0),colors.black),
+        ('ALIGN',(0,0),(-1,-1),'LEFT'),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('FONTNAME', (0,1), (-1,-1), 'Helvetica'),
+        ('BOTTOMPADDING', (0,0), (-1,0), 8),
+        ('BACKGROUND',(0,1),(-1,-1),colors.whitesmoke),
+        ('GRID', (0,0), (-1,-1), 0.25, colors.grey)
+    ])
+    return getSampleStyleSheet(), table_style
+
+def export_pdf(filename, company_name, buffett_score, metrics: dict, preformatted: bool = False):
+    """Pass preformatted=True when every metric value is already a display string."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
+
+    styles, table_style = _pdf_styles()
     doc = SimpleDocTemplate(filename, pagesize=letter, rightMargin=36, leftMargin=36, topMargin=36, bottomMargin=36)
-    styles = getSampleStyleSheet()
     content = []
 
     title_style = styles['Title']
@@ -22,17 +45,17 @@ def export_pdf(filename, company_name, buffett_score, metrics: dict):
     content.append(Paragraph(f"<b>Buffett Score:</b> {buffett_score:.1f}/100", subtitle_style))
     content.append(Spacer(1, 6))
 
-    data = [["Metric", "Value"]] + [[k, str(v)] for k, v in metrics.items()]
-    table = Table(data, colWidths=[200, 300])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#d9e6f2")),
-        ('TEXTCOLOR',(0,0),(-1,0),colors.black),
-        ('ALIGN',(0,0),(-1,-1),'LEFT'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0,0), (-1,0), 8),
-        ('BACKGROUND',(0,1),(-1,-1),colors.whitesmoke),
-        ('GRID', (0,0), (-1,-1), 0.25, colors.grey)
-    ]))
+    # Strings pass through untouched; floats get 2 decimals instead of a 17-digit repr
+    rows = [("Metric", "Value")]
+    if preformatted:
+        rows.extend(metrics.items())
+    else:
+        rows.extend(
+            (k, v if isinstance(v, str) else f"{v:.2f}" if isinstance(v, float) else str(v))
+            for k, v in metrics.items()
+        )
+    table = Table(rows, colWidths=[200, 300], repeatRows=1)
+    table.setStyle(table_style)
     content.append(table)
 
     doc.build(content)
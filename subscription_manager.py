@@ -1,10 +1,21 @@
 # subscription_manager.py
+import logging
 import os
 import streamlit as st
 import sqlite3
+import threading
+import time
+from collections import namedtuple
 from datetime import datetime, timedelta
 from typing import Optional
 
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from quota_manager import QuotaManager
+from users_db import ConnectionPool, get_pool
+
+logger = logging.getLogger(__name__)
+
 # Only import stripe if available (for development without Stripe)
 try:
     import stripe
@@ -29,7 +40,221 @@ def _cfg(env_key: str, secret_key: Optional[str] = None, default: str = "") -> s
         return default
 
 
+# Result of check_subscription_status(); days_remaining is None for open-ended plans.
+SubscriptionStatus = namedtuple("SubscriptionStatus", "tier active days_remaining")
+_FREE_ACTIVE = SubscriptionStatus("free", True, None)
+_FREE_INACTIVE = SubscriptionStatus("free", False, 0)
+
+_SELECT_STATUS_SQL = "SELECT subscription_tier, subscription_end_epoch FROM users WHERE email = ?"
+# Subscription end as epoch seconds next to the ISO subscription_end_date, so the
+# status check is an integer compare. Added (and backfilled) by _migrate_users()
+# as soon as the users table exists.
+_ADD_END_EPOCH_SQL = "ALTER TABLE users ADD COLUMN subscription_end_epoch INTEGER"
+_BACKFILL_END_EPOCH_SQL = """UPDATE users
+                             SET subscription_end_epoch = CAST(strftime('%s', subscription_end_date, 'utc') AS INTEGER)
+                             WHERE subscription_end_epoch IS NULL AND subscription_end_date IS NOT NULL"""
+# UPDATE ... RETURNING needs SQLite 3.35+; older builds re-read the row instead.
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+# Checkout sessions already applied; a repeat (refresh, Stripe retry) is a no-op.
+_CREATE_EVENTS_SQL = """CREATE TABLE IF NOT EXISTS processed_stripe_events (
+                            session_id TEXT PRIMARY KEY,
+                            ts TEXT
+                        )"""
+_INSERT_EVENT_SQL = "INSERT OR IGNORE INTO processed_stripe_events (session_id, ts) VALUES (?, ?)"
+# Newest applied session per user (Stripe `created`, epoch seconds). A late retry
+# of an older session must not overwrite a newer plan change.
+_CREATE_WATERMARKS_SQL = """CREATE TABLE IF NOT EXISTS stripe_event_watermarks (
+                                user_email TEXT PRIMARY KEY,
+                                last_event_ts INTEGER NOT NULL
+                            )"""
+# Affects no row (rowcount 0) when the stored watermark is as new or newer.
+_ADVANCE_WATERMARK_SQL = """INSERT INTO stripe_event_watermarks (user_email, last_event_ts) VALUES (?, ?)
+                            ON CONFLICT(user_email) DO UPDATE SET last_event_ts = excluded.last_event_ts
+                            WHERE excluded.last_event_ts > stripe_event_watermarks.last_event_ts"""
+
+
+# Batched downgrade of lapsed subscriptions, run off the request path.
+_SWEEP_EXPIRED_SQL = """UPDATE users
+                        SET subscription_tier = 'free', subscription_id = NULL,
+                            subscription_end_date = NULL, subscription_end_epoch = NULL
+                        WHERE subscription_tier != 'free' AND subscription_end_epoch < ?"""
+SWEEP_INTERVAL = 5 * 60  # seconds
+# Cross-process advisory lock: a process may sweep only after taking the lease
+# row for the current interval, so several app processes do not all sweep.
+_CREATE_LOCKS_SQL = """CREATE TABLE IF NOT EXISTS maintenance_locks (
+                           name TEXT PRIMARY KEY,
+                           until INTEGER NOT NULL
+                       )"""
+_TAKE_LEASE_SQL = """INSERT INTO maintenance_locks (name, until) VALUES (?, ?)
+                     ON CONFLICT(name) DO UPDATE SET until = excluded.until
+                     WHERE maintenance_locks.until <= ?"""
+
+
+# Database files whose users table already has subscription_end_epoch (see _subscription_pool()).
+_migrated_paths: set = set()
+
+
+@st.cache_resource(show_spinner=False)
+def _schema_pool(db_path: str) -> ConnectionPool:
+    """The users_db pool with the Stripe bookkeeping tables created (once per process)."""
+    pool = get_pool(db_path)
+    with pool.acquire(write=True) as conn:
+        conn.execute(_CREATE_EVENTS_SQL)
+        conn.execute(_CREATE_WATERMARKS_SQL)
+        conn.execute(_CREATE_LOCKS_SQL)
+    return pool
+
+
+def _migrate_users(pool: ConnectionPool, db_path: str):
+    """Add subscription_end_epoch to users once that table exists.
+
+    The pool can be built (e.g. by the expiry sweeper) before anything has created
+    users, so callers retry this until it succeeds; until then it is one PRAGMA on
+    a reader connection.
+    """
+    try:
+        with pool.acquire() as conn:
+            cols = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+        if not cols:
+            return
+        if "subscription_end_epoch" not in cols:
+            with pool.acquire(write=True) as conn:
+                # Re-check under the writer: another thread may have just added it
+                cols = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+                if "subscription_end_epoch" not in cols:
+                    conn.execute(_ADD_END_EPOCH_SQL)
+                    conn.execute(_BACKFILL_END_EPOCH_SQL)
+        _migrated_paths.add(db_path)
+    except sqlite3.Error as e:
+        logger.error("Error migrating users table: %s", e)
+
+
+def _subscription_pool(db_path: str) -> ConnectionPool:
+    """Pool for subscription queries, with the schema above in place."""
+    pool = _schema_pool(db_path)
+    if db_path not in _migrated_paths:
+        _migrate_users(pool, db_path)
+    return pool
+
+
+def _on_render_path() -> bool:
+    """True on a Streamlit script thread, the only place st.session_state exists
+    (not the sweeper, worker threads or bare-Python callers)."""
+    return get_script_run_ctx() is not None
+
+
+@st.cache_resource(show_spinner=False)
+def _get_quota_manager(db_path: str) -> QuotaManager:
+    """Process-wide QuotaManager per database file (it shares the users_db pool)."""
+    return QuotaManager(db_path)
+
+
+def _sweep_expired(pool: ConnectionPool, force: bool = False) -> int:
+    """Downgrade every lapsed subscription in one UPDATE; returns the number downgraded.
+
+    Without force, does nothing unless this process wins the lease for the interval.
+    """
+    now = int(time.time())
+    with pool.transaction() as conn:
+        if not force and conn.execute(_TAKE_LEASE_SQL, ("sweep_expired", now + SWEEP_INTERVAL, now)).rowcount == 0:
+            return 0
+        return conn.execute(_SWEEP_EXPIRED_SQL, (now,)).rowcount
+
+
+@st.cache_resource(show_spinner=False)
+def _start_expiry_sweeper(db_path: str, _pool: ConnectionPool) -> threading.Thread:
+    """One daemon thread per database file that sweeps every SWEEP_INTERVAL seconds.
+
+    The thread has no Streamlit script context, so it is handed the pool (resolved
+    by the caller; the leading underscore keeps it out of the cache key) and
+    reports through logging rather than st.* or print.
+    """
+    def _run():
+        while True:
+            try:
+                if db_path not in _migrated_paths:
+                    _migrate_users(_pool, db_path)
+                n = _sweep_expired(_pool)
+                if n:
+                    logger.info("Downgraded %d expired subscriptions", n)
+            except Exception:
+                logger.exception("Error sweeping expired subscriptions")
+            time.sleep(SWEEP_INTERVAL)
+
+    thread = threading.Thread(target=_run, name="subscription-expiry-sweeper", daemon=True)
+    thread.start()
+    return thread
+
+
 class SubscriptionManager:
+    # Status is re-read at most this often per session. The cache lives in
+    # st.session_state (per user), never st.cache_data, which is shared across users.
+    STATUS_CACHE_TTL = 60  # seconds
+    # _now() hands out the same timestamp for this long, i.e. within one render.
+    NOW_REUSE_SECONDS = 1.0
+
+    # Static plan cards and testimonials for show_upgrade_modal (built once, not per rerun)
+    FREE_PLAN_MD = """\
+### 🆓 Free Plan
+**Current Plan** *(if free)*
+
+**What you get:**
+- 3 company analyses/week
+- S&P 500 companies only
+- Basic Owner Earnings
+- Basic Altman Z-Score
+- Circle of Competence (3 sectors)
+
+**Perfect for:** Getting started with Buffett-style investing
+"""
+    PREMIUM_PLAN_MD = """\
+### ⭐ Premium Plan
+**$49/month**
+
+**Everything in Free plus:**
+- ✨ **Unlimited analyses**
+- 🌍 **Any public company**
+- 📊 **Advanced risk metrics**
+- 💡 **Look-Through Earnings**
+- 🔄 **Contrarian analysis**
+- 🤖 **AI insights (5/day)**
+- 📄 **PDF report exports**
+
+**Perfect for:** Serious individual investors
+"""
+    PROFESSIONAL_PLAN_MD = """\
+### 🏆 Professional Plan
+**$149/month**
+
+**Everything in Premium plus:**
+- 🤖 **Unlimited AI analysis**
+- 🔧 **Greenwald CapEx method**
+- 📊 **Bulk CSV analysis**
+- 🔗 **API access**
+- 💼 **Portfolio analysis**
+- 📊 **Excel/JSON exports**
+- 🎯 **Priority support**
+
+**Perfect for:** Investment professionals & firms
+"""
+    TESTIMONIAL_1_MD = """\
+> "This app saved me hours of manual calculations. The Owner Earnings analysis is spot-on with Buffett's methodology."
+>
+> — Sarah M., Portfolio Manager
+"""
+    TESTIMONIAL_2_MD = """\
+> "The AI insights help me understand what Buffett would think about each investment. Game changer!"
+>
+> — Mike D., Individual Investor
+"""
+
+    # (plan, card markdown, button label, button key) in display order
+    PLAN_SPECS = (
+        ("free", FREE_PLAN_MD, "⬇️ Downgrade to Free", "downgrade_free"),
+        ("premium", PREMIUM_PLAN_MD, "🚀 Upgrade to Premium", "upgrade_premium"),
+        ("professional", PROFESSIONAL_PLAN_MD, "🏆 Upgrade to Professional", "upgrade_professional"),
+    )
+
     def __init__(self):
         # --- App & DB paths ---
         self.db_path = os.getenv("DATABASE_PATH", "buffett_users.db")
@@ -55,87 +280,33 @@ class SubscriptionManager:
         elif STRIPE_AVAILABLE and not self.stripe_api_key and not self.demo_mode:
             st.warning("Stripe installed but STRIPE_API_KEY is not set; running without billing.")
 
+        # Lapsed subscriptions are downgraded in batches in the background; the
+        # per-user check in _status_from_row only covers the gap between sweeps.
+        _start_expiry_sweeper(self.db_path, _subscription_pool(self.db_path))
+
     def show_upgrade_modal(self, user_email: str, current_tier: str = "free"):
         """Show upgrade modal with pricing plans"""
         st.markdown("## 🚀 Unlock the Full Power of Buffett Analysis")
 
-        # Create three columns for the plans
-        col1, col2, col3 = st.columns(3)
-
-        with col1:
-            st.markdown("""
-            ### 🆓 Free Plan
-            **Current Plan** *(if free)*
-
-            **What you get:**
-            - 3 company analyses/week
-            - S&P 500 companies only
-            - Basic Owner Earnings
-            - Basic Altman Z-Score
-            - Circle of Competence (3 sectors)
-
-            **Perfect for:** Getting started with Buffett-style investing
-            """)
-            if current_tier != "free":
-                if st.button("⬇️ Downgrade to Free", key="downgrade_free", use_container_width=True):
-                    self._update_subscription(user_email, "free", None)
-                    st.success("Downgraded to Free plan")
-                    st.rerun()
-
-        with col2:
-            st.markdown("""
-            ### ⭐ Premium Plan
-            **$49/month**
-
-            **Everything in Free plus:**
-            - ✨ **Unlimited analyses**
-            - 🌍 **Any public company**
-            - 📊 **Advanced risk metrics**
-            - 💡 **Look-Through Earnings**
-            - 🔄 **Contrarian analysis**
-            - 🤖 **AI insights (5/day)**
-            - 📄 **PDF report exports**
-
-            **Perfect for:** Serious individual investors
-            """)
-            if current_tier != "premium":
-                if self.stripe_configured:
-                    if st.button("🚀 Upgrade to Premium", key="upgrade_premium", use_container_width=True):
-                        checkout_url = self.create_checkout_session(user_email, "premium")
-                        if checkout_url:
-                            st.markdown(f"[Complete Payment →]({checkout_url})")
-                        else:
-                            st.error("Payment setup error. Please try again.")
-                else:
-                    st.button("🚀 Upgrade to Premium", key="upgrade_premium_demo", use_container_width=True, disabled=True)
-                    st.caption("*Demo mode - Stripe not configured*")
-
-        with col3:
-            st.markdown("""
-            ### 🏆 Professional Plan
-            **$149/month**
-
-            **Everything in Premium plus:**
-            - 🤖 **Unlimited AI analysis**
-            - 🔧 **Greenwald CapEx method**
-            - 📊 **Bulk CSV analysis**
-            - 🔗 **API access**
-            - 💼 **Portfolio analysis**
-            - 📊 **Excel/JSON exports**
-            - 🎯 **Priority support**
-
-            **Perfect for:** Investment professionals & firms
-            """)
-            if current_tier != "professional":
-                if self.stripe_configured:
-                    if st.button("🏆 Upgrade to Professional", key="upgrade_professional", use_container_width=True):
-                        checkout_url = self.create_checkout_session(user_email, "professional")
-                        if checkout_url:
-                            st.markdown(f"[Complete Payment →]({checkout_url})")
-                        else:
-                            st.error("Payment setup error. Please try again.")
+        # Result of a plan button clicked on the previous run (set by _handle_plan_choice)
+        notice = st.session_state.pop("_plan_choice_notice", None)
+        if notice:
+            getattr(st, notice[0])(notice[1])
+        checkout = st.session_state.pop("_plan_checkout", None)
+
+        # One column per plan
+        for col, (plan, card_md, label, key) in zip(st.columns(len(self.PLAN_SPECS)), self.PLAN_SPECS):
+            with col:
+                st.markdown(card_md)
+                if current_tier == plan:
+                    continue
+                if plan == "free" or self.stripe_configured:
+                    st.button(label, key=key, use_container_width=True,
+                              on_click=self._handle_plan_choice, args=(user_email, plan))
+                    if checkout and checkout[0] == plan:
+                        st.markdown(f"[Complete Payment →]({checkout[1]})")
                 else:
-                    st.button("🏆 Upgrade to Professional", key="upgrade_professional_demo", use_container_width=True, disabled=True)
+                    st.button(label, key=f"{key}_demo", use_container_width=True, disabled=True)
                     st.caption("*Demo mode - Stripe not configured*")
 
         # Show testimonials or value props
@@ -144,17 +315,9 @@ class SubscriptionManager:
 
         col1, col2 = st.columns(2)
         with col1:
-            st.markdown("""
-            > "This app saved me hours of manual calculations. The Owner Earnings analysis is spot-on with Buffett's methodology."
-            >
-            > — Sarah M., Portfolio Manager
-            """)
+            st.markdown(self.TESTIMONIAL_1_MD)
         with col2:
-            st.markdown("""
-            > "The AI insights help me understand what Buffett would think about each investment. Game changer!"
-            >
-            > — Mike D., Individual Investor
-            """)
+            st.markdown(self.TESTIMONIAL_2_MD)
 
         # Money back guarantee
         st.info("💰 **30-day money-back guarantee** • Cancel anytime • No hidden fees")
@@ -165,15 +328,26 @@ class SubscriptionManager:
             st.markdown("### 🧪 Demo Mode")
             col1, col2 = st.columns(2)
             with col1:
-                if st.button("Demo: Upgrade to Premium", key="demo_premium"):
-                    self._update_subscription(user_email, "premium", "demo_premium_123")
-                    st.success("Demo: Upgraded to Premium!")
-                    st.rerun()
+                st.button("Demo: Upgrade to Premium", key="demo_premium",
+                          on_click=self._handle_plan_choice, args=(user_email, "premium", True))
             with col2:
-                if st.button("Demo: Upgrade to Professional", key="demo_professional"):
-                    self._update_subscription(user_email, "professional", "demo_professional_123")
-                    st.success("Demo: Upgraded to Professional!")
-                    st.rerun()
+                st.button("Demo: Upgrade to Professional", key="demo_professional",
+                          on_click=self._handle_plan_choice, args=(user_email, "professional", True))
+
+    def _handle_plan_choice(self, user_email: str, plan: str, demo: bool = False):
+        """on_click callback for the plan buttons; runs before the rerun it triggers."""
+        if plan == "free":
+            self._update_subscription(user_email, "free", None)
+            st.session_state["_plan_choice_notice"] = ("success", "Downgraded to Free plan")
+        elif demo:
+            self._update_subscription(user_email, plan, f"demo_{plan}_123")
+            st.session_state["_plan_choice_notice"] = ("success", f"Demo: Upgraded to {plan.title()}!")
+        else:
+            checkout_url = self.create_checkout_session(user_email, plan)
+            if checkout_url:
+                st.session_state["_plan_checkout"] = (plan, checkout_url)
+            else:
+                st.session_state["_plan_choice_notice"] = ("error", "Payment setup error. Please try again.")
 
     def create_checkout_session(self, user_email: str, plan: str) -> Optional[str]:
         """Create Stripe checkout session"""
@@ -205,7 +379,7 @@ class SubscriptionManager:
             return checkout_session.url
         except Exception as e:
             st.error(f"Error creating checkout session: {str(e)}")
-            print(f"Stripe error: {e}")
+            logger.exception("Stripe error creating checkout session for %s", user_email)
             return None
 
     def handle_successful_payment(self, session_id: str) -> bool:
@@ -218,77 +392,141 @@ class SubscriptionManager:
                 user_email = session.metadata.get('user_email')
                 plan = session.metadata.get('plan')
                 subscription_id = session.subscription
+                created = getattr(session, "created", None)
                 if user_email and plan:
-                    self._update_subscription(user_email, plan, subscription_id)
+                    # Record the session and apply the plan atomically; a session we
+                    # have already applied, or one older than the last applied for
+                    # this user, must not touch the subscription again.
+                    with _subscription_pool(self.db_path).transaction() as conn:
+                        is_new = conn.execute(_INSERT_EVENT_SQL, (session_id, self._now().isoformat())).rowcount == 1
+                        if is_new and created is not None:
+                            is_new = conn.execute(_ADVANCE_WATERMARK_SQL, (user_email, int(created))).rowcount == 1
+                        if is_new:
+                            row = self._write_subscription(conn, user_email, plan, subscription_id, 30)
+                    if not is_new:
+                        return True
+                    self._remember_status(user_email, row)
+                    logger.info("Subscription updated for %s: %s", user_email, plan)
                     st.success(f"🎉 Welcome to {plan.title()}! Your subscription is now active.")
                     return True
         except Exception as e:
             st.error(f"Error processing payment: {str(e)}")
-            print(f"Payment processing error: {e}")
+            logger.exception("Payment processing error for session %s", session_id)
         return False
 
-    def _update_subscription(self, email: str, tier: str, subscription_id: str, days: int = 30):
-        """Update user subscription in database"""
-        conn = sqlite3.connect(self.db_path)
+    def _update_subscription(self, email: str, tier: str, subscription_id: str, days: int = 30) -> Optional[tuple]:
+        """Update user subscription in database
+
+        Returns the stored (subscription_tier, subscription_end_epoch), or None if
+        the user does not exist or the write failed. The row also refreshes the
+        session's cached status, so the next check needs no SELECT.
+        """
         try:
-            if tier == "free":
-                conn.execute(
-                    """UPDATE users
-                       SET subscription_tier = 'free', subscription_id = NULL, subscription_end_date = NULL
-                       WHERE email = ?""",
-                    (email,)
-                )
-            else:
-                end_date = (datetime.now() + timedelta(days=days)).isoformat()
-                conn.execute(
-                    """UPDATE users
-                       SET subscription_tier = ?, subscription_id = ?, subscription_end_date = ?
-                       WHERE email = ?""",
-                    (tier, subscription_id, end_date, email)
-                )
-            conn.commit()
-            print(f"✅ Subscription updated for {email}: {tier}")
-        except Exception as e:
-            print(f"Error updating subscription: {e}")
-        finally:
-            conn.close()
+            with _subscription_pool(self.db_path).acquire(write=True) as conn:
+                row = self._write_subscription(conn, email, tier, subscription_id, days)
+            self._remember_status(email, row)
+            logger.info("Subscription updated for %s: %s", email, tier)
+            return row
+        except Exception:
+            logger.exception("Error updating subscription for %s", email)
+            return None
 
-    def check_subscription_status(self, email: str) -> dict:
-        """Check current subscription status"""
-        conn = sqlite3.connect(self.db_path)
+    def _write_subscription(self, conn: sqlite3.Connection, email: str, tier: str,
+                            subscription_id: Optional[str], days: int) -> Optional[tuple]:
+        if tier == "free":
+            sql = """UPDATE users
+                     SET subscription_tier = 'free', subscription_id = NULL,
+                         subscription_end_date = NULL, subscription_end_epoch = NULL
+                     WHERE email = ?"""
+            params = (email,)
+        else:
+            end = self._now() + timedelta(days=days)
+            sql = """UPDATE users
+                     SET subscription_tier = ?, subscription_id = ?,
+                         subscription_end_date = ?, subscription_end_epoch = ?
+                     WHERE email = ?"""
+            params = (tier, subscription_id, end.isoformat(), int(end.timestamp()), email)
+        if HAS_RETURNING:
+            return conn.execute(sql + " RETURNING subscription_tier, subscription_end_epoch", params).fetchone()
+        conn.execute(sql, params)
+        return conn.execute(_SELECT_STATUS_SQL, (email,)).fetchone()
+
+    def _remember_status(self, email: str, row: Optional[tuple]):
+        if not _on_render_path():
+            return
+        key = self._status_key(email)
+        if row is None:
+            st.session_state.pop(key, None)
+        else:
+            st.session_state[key] = {"ts": self._now().timestamp(), "value": self._status_from_row(email, *row)}
+
+    def sweep_expired(self) -> int:
+        """Downgrade all lapsed subscriptions now (one batched UPDATE)."""
         try:
-            user = conn.execute(
-                "SELECT subscription_tier, subscription_end_date FROM users WHERE email = ?",
-                (email,)
-            ).fetchone()
-
-            if not user:
-                return {"tier": "free", "active": False, "days_remaining": 0}
-
-            tier, end_date = user
-
-            if tier == "free":
-                return {"tier": "free", "active": True, "days_remaining": None}
-
-            if end_date:
-                try:
-                    end_datetime = datetime.fromisoformat(end_date)
-                    now = datetime.now()
-                    if end_datetime > now:
-                        days_remaining = (end_datetime - now).days
-                        return {"tier": tier, "active": True, "days_remaining": days_remaining}
-                    else:
-                        self._update_subscription(email, "free", None)
-                        return {"tier": "free", "active": False, "days_remaining": 0}
-                except Exception:
-                    return {"tier": "free", "active": False, "days_remaining": 0}
-
-            return {"tier": tier, "active": True, "days_remaining": None}
-        except Exception as e:
-            print(f"Error checking subscription: {e}")
-            return {"tier": "free", "active": False, "days_remaining": 0}
-        finally:
-            conn.close()
+            return _sweep_expired(_subscription_pool(self.db_path), force=True)
+        except Exception:
+            logger.exception("Error sweeping expired subscriptions")
+            return 0
+
+    def _now(self) -> datetime:
+        """One wall-clock "now" per render, so every date computed in it agrees.
+
+        session_state outlives the rerun, so the cached value is only reused for
+        NOW_REUSE_SECONDS (measured on the monotonic clock). Off the render path
+        there is no session_state, so it is just datetime.now().
+        """
+        if not _on_render_path():
+            return datetime.now()
+        hit = st.session_state.get("_render_now")
+        tick = time.monotonic()
+        if hit is None or tick - hit[0] > self.NOW_REUSE_SECONDS:
+            hit = (tick, datetime.now())
+            st.session_state["_render_now"] = hit
+        return hit[1]
+
+    @staticmethod
+    def _status_key(email: str) -> str:
+        return f"_sub_status_{email}"
+
+    def check_subscription_status(self, email: str) -> SubscriptionStatus:
+        """Check current subscription status (cached per session for STATUS_CACHE_TTL)"""
+        key = self._status_key(email)
+        cached = _on_render_path()
+        hit = st.session_state.get(key) if cached else None
+        if hit is not None and self._now().timestamp() - hit["ts"] < self.STATUS_CACHE_TTL:
+            return hit["value"]
+        try:
+            status = self._read_subscription_status(email)
+        except Exception:
+            # Not cached: the next rerun retries instead of pinning a paying user to free
+            logger.exception("Error checking subscription for %s", email)
+            return _FREE_INACTIVE
+        if cached:
+            st.session_state[key] = {"ts": self._now().timestamp(), "value": status}
+        return status
+
+    def _read_subscription_status(self, email: str) -> SubscriptionStatus:
+        with _subscription_pool(self.db_path).acquire() as conn:
+            user = conn.execute(_SELECT_STATUS_SQL, (email,)).fetchone()
+
+        if not user:
+            return _FREE_INACTIVE
+
+        return self._status_from_row(email, *user)
+
+    def _status_from_row(self, email: str, tier: str, end_epoch: Optional[int]) -> SubscriptionStatus:
+        """Status for a users row; downgrades the user if the subscription has lapsed."""
+        if tier == "free":
+            return _FREE_ACTIVE
+
+        if end_epoch is not None:
+            remaining = end_epoch - int(self._now().timestamp())
+            if remaining > 0:
+                return SubscriptionStatus(tier, True, remaining // 86400)
+            self._update_subscription(email, "free", None)
+            return _FREE_INACTIVE
+
+        return SubscriptionStatus(tier, True, None)
 
     def show_account_settings(self, user_email: str):
         """Show account settings and subscription management"""
@@ -299,12 +537,12 @@ class SubscriptionManager:
         col1, col2 = st.columns([2, 1])
         with col1:
             st.markdown(f"**Email:** {user_email}")
-            st.markdown(f"**Current Plan:** {status['tier'].title()}")
-            if status['active'] and status['days_remaining'] is not None:
-                if status['days_remaining'] > 7:
-                    st.success(f"✅ {status['days_remaining']} days remaining")
-                elif status['days_remaining'] > 0:
-                    st.warning(f"⚠️ {status['days_remaining']} days remaining")
+            st.markdown(f"**Current Plan:** {status.tier.title()}")
+            if status.active and status.days_remaining is not None:
+                if status.days_remaining > 7:
+                    st.success(f"✅ {status.days_remaining} days remaining")
+                elif status.days_remaining > 0:
+                    st.warning(f"⚠️ {status.days_remaining} days remaining")
                 else:
                     st.error("❌ Subscription expired")
         with col2:
@@ -318,8 +556,7 @@ class SubscriptionManager:
 
     def _show_usage_stats(self, user_email: str):
         """Show detailed usage statistics"""
-        from quota_manager import QuotaManager
-        quota_manager = QuotaManager()
+        quota_manager = _get_quota_manager(self.db_path)
         usage = quota_manager.get_user_usage_summary(user_email)
 
         if usage:
@@ -0,0 +1,72 @@
+# users_db.py
+# Shared SQLite access to the users database (quotas and subscriptions).
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import streamlit as st
+
+
+class ConnectionPool:
+    """One serialized writer plus a few reader connections to the users DB.
+
+    SQLite allows a single writer at a time; in WAL mode readers never block
+    on it, so SELECTs get their own connections. Connections are opened once
+    per process (see get_pool) and are not tied to the Streamlit script thread,
+    which changes on every rerun. Rows are sqlite3.Row (by name or position).
+    """
+
+    def __init__(self, db_path: str, readers: int = 4):
+        # Re-entrant so code already holding the writer can borrow it again
+        self._write_lock = threading.RLock()
+        self._writer = self._open(db_path)
+        # Every ":memory:" connection is a separate database, so reads use the writer
+        self._readers: "Optional[queue.Queue[sqlite3.Connection]]" = None
+        if db_path != ":memory:":
+            self._readers = queue.Queue()
+            for _ in range(readers):
+                self._readers.put(self._open(db_path))
+
+    @staticmethod
+    def _open(db_path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")  # 256 MB; reads skip the read() syscalls
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def acquire(self, write: bool = False) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection (autocommit); write=True waits for the writer."""
+        if write or self._readers is None:
+            with self._write_lock:
+                yield self._writer
+            return
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """The writer inside BEGIN IMMEDIATE ... COMMIT (ROLLBACK on error)."""
+        with self.acquire(write=True) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+
+@st.cache_resource(show_spinner=False)
+def get_pool(db_path: str) -> ConnectionPool:
+    """Process-wide pool per database file, shared by every session."""
+    return ConnectionPool(db_path)
@@ -4,11 +4,53 @@
 
 from __future__ import annotations
 import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Optional, Any
 
 import pandas as pd
+import streamlit as st
 import yfinance as yf
 
+# The fetchers are cached with st.cache_data. That cache is process-wide and
+# shared by every session, which is fine here: market data is the same for
+# every user. Prices and quotes move, so they get an hour; statements change
+# quarterly, so a day.
+#
+# A failed request must not be cached, or one rate limit or timeout would blank
+# a ticker for the whole TTL. So each cached function is private and raises
+# (also when Yahoo answers with nothing), and the public fetch_* wrapper is
+# uncached and turns the error into the usual empty result.
+PRICE_TTL = 60 * 60
+INTRADAY_TTL = 60
+FUNDAMENTALS_TTL = 24 * 60 * 60
+
+
+@st.cache_resource(show_spinner=False)
+def get_http_session():
+    """
+    One keep-alive HTTP session for every yfinance request in the process, so
+    repeat requests reuse pooled TLS connections. yfinance >= 0.2.54 only
+    accepts a curl_cffi session; older releases take a requests.Session.
+    """
+    try:
+        from curl_cffi import requests as curl_requests
+        return curl_requests.Session(impersonate="chrome")
+    except ImportError:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(
+            pool_connections=10, pool_maxsize=10,
+            max_retries=Retry(total=3, backoff_factor=0.3),
+        ))
+        return session
+
+
+def _ticker(ticker: str, session=None) -> yf.Ticker:
+    return yf.Ticker(ticker, session=session or get_http_session())
+
 
 # -----------------------------
 # ---- low-level utilities ----
@@ -18,24 +60,29 @@ def _as_df(obj) -> pd.DataFrame:
     return obj if isinstance(obj, pd.DataFrame) and not obj.empty else pd.DataFrame()
 
 
-def _latest_from_df(df: pd.DataFrame, row_aliases: List[str]) -> Optional[float]:
+def _latest_many(df: pd.DataFrame, fields: Dict[str, List[str]]) -> Dict[str, Optional[float]]:
     """
-    Given a Yahoo-style DF (rows=line items, cols=dates), return the most recent value
-    for the first alias that exists. Returns None if not found/empty.
+    Given a Yahoo-style DF (rows=line items, cols=dates) and {field: row_aliases},
+    return {field: most recent value of the first alias that has one, else None}.
+    One reindex covers every alias; a backward fill across the columns then gives
+    each row's newest non-null value without per-field Series lookups.
     """
+    out: Dict[str, Optional[float]] = {key: None for key in fields}
     df = _as_df(df)
     if df.empty:
-        return None
-    for alias in row_aliases:
-        if alias in df.index:
-            s = df.loc[alias]
-            for v in s:  # columns are newest -> oldest; use first non-null
-                if pd.notna(v):
-                    try:
-                        return float(v)
-                    except Exception:
-                        pass
-    return None
+        return out
+    if not df.index.is_unique:
+        df = df[~df.index.duplicated()]
+    aliases = list(dict.fromkeys(a for names in fields.values() for a in names))
+    sub = df.reindex(aliases).apply(pd.to_numeric, errors="coerce")
+    latest = sub.bfill(axis=1).iloc[:, 0]  # columns are newest -> oldest
+    for key, names in fields.items():
+        for alias in names:
+            v = latest[alias]
+            if pd.notna(v):
+                out[key] = float(v)
+                break
+    return out
 
 
 def _series_from_df(df: pd.DataFrame, row_aliases: List[str], max_points: int = 8) -> List[float]:
@@ -77,128 +124,141 @@ def _nan_or(x: Optional[float], default: Optional[float] = None) -> Optional[flo
 # -----------------------------
 # ---------- API --------------
 # -----------------------------
+@st.cache_data(ttl=PRICE_TTL, show_spinner=False)
+def _prices_daily(ticker: str, years: int) -> pd.Series:
+    """Cached body of fetch_prices_daily(); raises instead of returning an empty Series."""
+    period = f"{years}y"
+    # Ticker.history() returns single-level OHLCV columns; with auto_adjust=True
+    # "Close" is already split/dividend adjusted.
+    df = _ticker(ticker).history(period=period, interval="1d", auto_adjust=True)
+
+    if df is None or df.empty:
+        raise ValueError("no price history returned")
+
+    if "Close" in df.columns:
+        s = df["Close"]
+    else:
+        num = df.select_dtypes(include=[float, int])
+        if num.empty:
+            raise ValueError("no price column in history")
+        s = num.iloc[:, 0]
+
+    # Convert to numeric and clean
+    s = pd.to_numeric(s, errors="coerce").dropna()
+    if s.empty:
+        raise ValueError("no numeric prices in history")
+    s.name = "Close"
+    return s
+
+
 def fetch_prices_daily(ticker: str, years: int = 10) -> pd.Series:
-    """Return a 1-D Series of daily Close prices. Handles MultiIndex columns from yfinance."""
+    """Return a 1-D Series of daily (adjusted) Close prices; empty on failure."""
     try:
-        period = f"{years}y"
-        df = yf.download(ticker, period=period, interval="1d", progress=False, auto_adjust=True)
-        
-        if df is None or df.empty:
-            return pd.Series(dtype=float, name="Close")
-
-        # Initialize s as None to track what we extract
-        s = None
-
-        # Handle both single-index and MultiIndex columns robustly
-        if isinstance(df.columns, pd.MultiIndex):
-            # Try the 'Close' panel first
-            try:
-                close_panel = df.xs("Close", axis=1, level=0, drop_level=False)
-            except Exception:
-                close_panel = None
-
-            if isinstance(close_panel, pd.DataFrame) and not close_panel.empty:
-                # If ticker-level exists, use it; otherwise first column
-                try:
-                    if ticker in close_panel.columns.get_level_values(-1):
-                        s = close_panel.xs(ticker, axis=1, level=-1, drop_level=True)
-                    else:
-                        s = close_panel.iloc[:, 0]
-                except Exception:
-                    s = close_panel.iloc[:, 0] if not close_panel.empty else None
-            else:
-                # Fallback: first numeric column anywhere
-                try:
-                    num = df.select_dtypes(include=[float, int])
-                    s = num.iloc[:, 0] if not num.empty else df.iloc[:, 0]
-                except Exception:
-                    s = None
-        else:
-            # Single-level columns
-            try:
-                if "Close" in df.columns:
-                    s = df["Close"]
-                else:
-                    num = df.select_dtypes(include=[float, int])
-                    s = num.iloc[:, 0] if not num.empty else df.iloc[:, 0]
-            except Exception:
-                s = None
-
-        # Ensure s is a proper Series before processing
-        if s is None:
-            return pd.Series(dtype=float, name="Close")
-        
-        # Convert to Series if it's a DataFrame
-        if isinstance(s, pd.DataFrame):
-            s = s.iloc[:, 0] if not s.empty else pd.Series(dtype=float)
-        
-        # Ensure it's a pandas Series
-        if not isinstance(s, pd.Series):
-            try:
-                s = pd.Series(s)
-            except Exception:
-                return pd.Series(dtype=float, name="Close")
-
-        # Convert to numeric and clean
-        s = pd.to_numeric(s, errors="coerce").dropna()
-        s.name = "Close"
-        return s
-        
+        return _prices_daily(ticker, years)
     except Exception as e:
         # Return empty Series on any error
         print(f"Error fetching prices for {ticker}: {e}")
         return pd.Series(dtype=float, name="Close")
 
 
+@st.cache_data(ttl=INTRADAY_TTL, show_spinner=False)
+def _intraday_1m(ticker: str) -> pd.DataFrame:
+    df = _as_df(_ticker(ticker).history(period="1d", interval="1m", auto_adjust=True))
+    if df.empty:
+        raise ValueError("no intraday bars returned")
+    return df
+
+
 def fetch_intraday_1m(ticker: str) -> pd.DataFrame:
     """Return a DataFrame of 1-minute bars for 1 day (empty if not available)."""
     try:
-        df = yf.download(ticker, period="1d", interval="1m", progress=False, auto_adjust=True)
-        return _as_df(df)
+        return _intraday_1m(ticker)
     except Exception:
         return pd.DataFrame()
 
 
+def _info_of(t) -> Dict[str, Any]:
+    info = getattr(t, "info", None) or {}
+    if not info:
+        info = t.get_info() or {}
+    return info
+
+
+def _profile_from(info: Dict[str, Any]) -> Dict[str, Any]:
+    sector = info.get("sector") or info.get("Sector")
+    industry = info.get("industry") or info.get("Industry")
+    return {"sector": sector, "industry": industry}
+
+
+@st.cache_data(ttl=PRICE_TTL, show_spinner=False)
+def _ticker_info(ticker: str) -> Dict[str, Any]:
+    """
+    Yahoo's .info scrape (slow, often over a second), shared by fetch_profile and
+    fetch_market_cap. Failures raise and so are never cached.
+    """
+    return _info_of(_ticker(ticker))
+
+
 def fetch_profile(ticker: str) -> Dict[str, Any]:
     """Return {'sector': ..., 'industry': ...} best-effort."""
     try:
-        t = yf.Ticker(ticker)
-        sector = None
-        industry = None
-        try:
-            info = getattr(t, "info", None) or {}
-            if not info:
-                info = t.get_info() or {}
-            sector = info.get("sector") or info.get("Sector")
-            industry = info.get("industry") or info.get("Industry")
-        except Exception:
-            pass
-        return {"sector": sector, "industry": industry}
+        return _profile_from(_ticker_info(ticker))
     except Exception:
         return {"sector": None, "industry": None}
 
 
+def _fast_market_cap(t) -> Optional[float]:
+    try:
+        mc = t.fast_info.get("market_cap")
+        if mc:
+            return float(mc)
+    except Exception:
+        pass
+    return None
+
+
+@st.cache_data(ttl=PRICE_TTL, show_spinner=False)
+def _fast_market_cap_of(ticker: str) -> float:
+    mc = _fast_market_cap(_ticker(ticker))
+    if mc is None:
+        raise ValueError("fast_info has no market cap")
+    return mc
+
+
 def fetch_market_cap(ticker: str) -> Optional[float]:
     """Return market cap via fast_info or info."""
     try:
-        t = yf.Ticker(ticker)
-        try:
-            mc = t.fast_info.get("market_cap")
-            if mc:
-                return float(mc)
-        except Exception:
-            pass
-        try:
-            info = getattr(t, "info", None) or {}
-            if not info:
-                info = t.get_info() or {}
-            return _nan_or(info.get("marketCap"))
-        except Exception:
-            return None
+        return _fast_market_cap_of(ticker)
+    except Exception:
+        pass
+    try:
+        return _nan_or(_ticker_info(ticker).get("marketCap"))
     except Exception:
         return None
 
 
+def _require_any(ticker: str, *tables: pd.DataFrame):
+    """yfinance logs and returns empty tables when Yahoo fails; don't cache that."""
+    if all(df.empty for df in tables):
+        raise ValueError(f"no statements returned for {ticker}")
+
+
+@st.cache_data(ttl=FUNDAMENTALS_TTL, show_spinner=False)
+def _fundamentals(ticker: str) -> Dict[str, Optional[float]]:
+    t = _ticker(ticker)
+
+    # Income & cash flow (quarterly preferred for TTM)
+    is_q = _as_df(getattr(t, "quarterly_financials", None))
+    cf_q = _as_df(getattr(t, "quarterly_cashflow", None))
+    is_a = _as_df(getattr(t, "financials", None))
+    cf_a = _as_df(getattr(t, "cashflow", None))
+
+    bs_a = _as_df(getattr(t, "balance_sheet", None))
+
+    _require_any(ticker, is_q, cf_q, is_a, cf_a, bs_a)
+    return _fundamentals_from(is_q, cf_q, is_a, cf_a, bs_a)
+
+
 def fetch_fundamentals(ticker: str) -> Dict[str, Optional[float]]:
     """
     Returns a dict with:
@@ -208,128 +268,140 @@ def fetch_fundamentals(ticker: str) -> Dict[str, Optional[float]]:
     Prefers TTM (sum of last 4 quarters) where appropriate; otherwise latest annual.
     """
     try:
-        t = yf.Ticker(ticker)
-
-        # Income & cash flow (quarterly preferred for TTM)
-        is_q = _as_df(getattr(t, "quarterly_financials", None))
-        cf_q = _as_df(getattr(t, "quarterly_cashflow", None))
-        is_a = _as_df(getattr(t, "financials", None))
-        cf_a = _as_df(getattr(t, "cashflow", None))
-
-        bs_q = _as_df(getattr(t, "quarterly_balance_sheet", None))
-        bs_a = _as_df(getattr(t, "balance_sheet", None))
-
-        def _ttm(df: pd.DataFrame, aliases: List[str]) -> Optional[float]:
-            vals = _series_from_df(df, aliases, max_points=4)
-            if not vals:
-                return None
-            return float(sum(vals))
-
-        # TTM fields
-        sales = _ttm(is_q, ["Total Revenue", "Operating Revenue", "Revenue"])
-        net_income = _ttm(is_q, ["Net Income"])
-        ebit = _ttm(is_q, ["Ebit", "EBIT"])
-        depreciation = _ttm(cf_q, ["Depreciation And Amortization", "Depreciation", "Amortization"])
-        capex_total = _ttm(cf_q, ["Capital Expenditures", "Investments In Property Plant And Equipment"])
-
-        # Fallback to annual if TTM missing
-        if sales is None:
-            sales = _latest_from_df(is_a, ["Total Revenue", "Operating Revenue", "Revenue"])
-        if net_income is None:
-            net_income = _latest_from_df(is_a, ["Net Income"])
-        if ebit is None:
-            ebit = _latest_from_df(is_a, ["Ebit", "EBIT"])
-        if depreciation is None:
-            depreciation = _latest_from_df(cf_a, ["Depreciation And Amortization", "Depreciation", "Amortization"])
-        if capex_total is None:
-            capex_total = _latest_from_df(cf_a, ["Capital Expenditures", "Investments In Property Plant And Equipment"])
-
-        # Take absolute CapEx (Yahoo often reports it as negative cash outflow)
-        capex_total = _abs_or_none(capex_total)
-
-        # Balance sheet (prefer latest annual snapshot for stock variables)
-        total_assets = _latest_from_df(bs_a, ["Total Assets"])
-        total_liabilities = _latest_from_df(
-            bs_a, ["Total Liab", "Total Liabilities", "Total Liabilities Net Minority Interest"]
-        )
+        return _fundamentals(ticker)
+    except Exception as e:
+        print(f"Error fetching fundamentals for {ticker}: {e}")
+        return dict(_EMPTY_FUNDAMENTALS)
 
-        # Net PP&E (with robust aliasing)
-        ppe_net = _latest_from_df(
-            bs_a,
-            [
-                "Property Plant Equipment Net",
-                "Net Property Plant Equipment",
-                "Property, Plant & Equipment Net",
-                "Net PPE",
-            ],
-        )
-        # Fallback: Gross PPE - Accumulated Depreciation
-        if ppe_net is None:
-            gross = _latest_from_df(bs_a, ["Property Plant Equipment", "Gross PPE", "Gross Property Plant And Equipment"])
-            acc_dep = _latest_from_df(bs_a, ["Accumulated Depreciation", "Accumulated Depreciation Amortization"])
-            if gross is not None and acc_dep is not None:
-                try:
-                    ppe_net = float(gross) - float(acc_dep)
-                except Exception:
-                    ppe_net = None
 
+def _fundamentals_from(is_q: pd.DataFrame, cf_q: pd.DataFrame, is_a: pd.DataFrame,
+                       cf_a: pd.DataFrame, bs_a: pd.DataFrame) -> Dict[str, Optional[float]]:
+    """Extract the fetch_fundamentals() fields from already-downloaded statements."""
+    def _ttm(df: pd.DataFrame, aliases: List[str]) -> Optional[float]:
+        vals = _series_from_df(df, aliases, max_points=4)
+        if not vals:
+            return None
+        return float(sum(vals))
+
+    # TTM fields
+    sales = _ttm(is_q, ["Total Revenue", "Operating Revenue", "Revenue"])
+    net_income = _ttm(is_q, ["Net Income"])
+    ebit = _ttm(is_q, ["Ebit", "EBIT"])
+    depreciation = _ttm(cf_q, ["Depreciation And Amortization", "Depreciation", "Amortization"])
+    capex_total = _ttm(cf_q, ["Capital Expenditures", "Investments In Property Plant And Equipment"])
+
+    # Fallback to annual if TTM missing
+    annual = _latest_many(is_a, {
+        "sales": ["Total Revenue", "Operating Revenue", "Revenue"],
+        "net_income": ["Net Income"],
+        "ebit": ["Ebit", "EBIT"],
+    })
+    annual.update(_latest_many(cf_a, {
+        "depreciation": ["Depreciation And Amortization", "Depreciation", "Amortization"],
+        "capex_total": ["Capital Expenditures", "Investments In Property Plant And Equipment"],
+    }))
+    if sales is None:
+        sales = annual["sales"]
+    if net_income is None:
+        net_income = annual["net_income"]
+    if ebit is None:
+        ebit = annual["ebit"]
+    if depreciation is None:
+        depreciation = annual["depreciation"]
+    if capex_total is None:
+        capex_total = annual["capex_total"]
+
+    # Take absolute CapEx (Yahoo often reports it as negative cash outflow)
+    capex_total = _abs_or_none(capex_total)
+
+    # Balance sheet (prefer latest annual snapshot for stock variables)
+    bs = _latest_many(bs_a, {
+        "total_assets": ["Total Assets"],
+        "total_liabilities": ["Total Liab", "Total Liabilities", "Total Liabilities Net Minority Interest"],
+        # Net PP&E (with robust aliasing)
+        "ppe_net": [
+            "Property Plant Equipment Net",
+            "Net Property Plant Equipment",
+            "Property, Plant & Equipment Net",
+            "Net PPE",
+        ],
+        "gross_ppe": ["Property Plant Equipment", "Gross PPE", "Gross Property Plant And Equipment"],
+        "acc_dep": ["Accumulated Depreciation", "Accumulated Depreciation Amortization"],
         # Retained Earnings (some feeds label as 'Accumulated Deficit' when negative)
-        retained_earnings = _latest_from_df(
-            bs_a,
-            ["Retained Earnings", "Retained Earnings (Accumulated Deficit)", "Retained earnings"],
-        )
-
-        # Working capital (compute for consistency)
-        current_assets = _latest_from_df(bs_a, ["Total Current Assets"])
-        current_liab = _latest_from_df(bs_a, ["Total Current Liabilities"])
-        working_capital = None
-        if current_assets is not None and current_liab is not None:
+        "retained_earnings": ["Retained Earnings", "Retained Earnings (Accumulated Deficit)", "Retained earnings"],
+        "current_assets": ["Total Current Assets"],
+        "current_liab": ["Total Current Liabilities"],
+    })
+    total_assets = bs["total_assets"]
+    total_liabilities = bs["total_liabilities"]
+    retained_earnings = bs["retained_earnings"]
+
+    ppe_net = bs["ppe_net"]
+    # Fallback: Gross PPE - Accumulated Depreciation
+    if ppe_net is None:
+        gross = bs["gross_ppe"]
+        acc_dep = bs["acc_dep"]
+        if gross is not None and acc_dep is not None:
             try:
-                working_capital = float(current_assets) - float(current_liab)
+                ppe_net = float(gross) - float(acc_dep)
             except Exception:
-                working_capital = None
+                ppe_net = None
+
+    # Working capital: both sides come from the single balance-sheet reindex above
+    # and are already NaN-guarded floats, so a None check is all that's needed.
+    current_assets = bs["current_assets"]
+    current_liab = bs["current_liab"]
+    working_capital = None
+    if current_assets is not None and current_liab is not None:
+        working_capital = current_assets - current_liab
+
+    # ---- Sanity checks / clamps ----
+    # If PP&E is implausibly tiny vs sales (e.g., $10K for a mega-cap), treat as None.
+    if ppe_net is not None and sales is not None:
+        try:
+            if abs(ppe_net) > 0 and abs(sales) > 0:
+                if abs(ppe_net) < 1e-5 * abs(sales) and abs(sales) > 1e9:
+                    ppe_net = None
+        except Exception:
+            pass
 
-        # ---- Sanity checks / clamps ----
-        # If PP&E is implausibly tiny vs sales (e.g., $10K for a mega-cap), treat as None.
-        if ppe_net is not None and sales is not None:
-            try:
-                if abs(ppe_net) > 0 and abs(sales) > 0:
-                    if abs(ppe_net) < 1e-5 * abs(sales) and abs(sales) > 1e9:
-                        ppe_net = None
-            except Exception:
-                pass
-
-        # If retained earnings still missing, one more direct try
-        if retained_earnings is None:
-            re_alt = _latest_from_df(bs_a, ["Retained Earnings"])
-            retained_earnings = re_alt
-
-        return {
-            "net_income": _nan_or(net_income),
-            "ebit": _nan_or(ebit),
-            "depreciation": _nan_or(depreciation),
-            "capex_total": _nan_or(capex_total),
-            "sales": _nan_or(sales),
-            "total_assets": _nan_or(total_assets),
-            "total_liabilities": _nan_or(total_liabilities),
-            "retained_earnings": _nan_or(retained_earnings),
-            "working_capital": _nan_or(working_capital),
-            "ppe_net": _nan_or(ppe_net),
-        }
-    except Exception as e:
-        print(f"Error fetching fundamentals for {ticker}: {e}")
-        return {
-            "net_income": None,
-            "ebit": None,
-            "depreciation": None,
-            "capex_total": None,
-            "sales": None,
-            "total_assets": None,
-            "total_liabilities": None,
-            "retained_earnings": None,
-            "working_capital": None,
-            "ppe_net": None,
-        }
+    return {
+        "net_income": _nan_or(net_income),
+        "ebit": _nan_or(ebit),
+        "depreciation": _nan_or(depreciation),
+        "capex_total": _nan_or(capex_total),
+        "sales": _nan_or(sales),
+        "total_assets": _nan_or(total_assets),
+        "total_liabilities": _nan_or(total_liabilities),
+        "retained_earnings": _nan_or(retained_earnings),
+        "working_capital": _nan_or(working_capital),
+        "ppe_net": _nan_or(ppe_net),
+    }
+
+
+_EMPTY_FUNDAMENTALS: Dict[str, Optional[float]] = {
+    "net_income": None,
+    "ebit": None,
+    "depreciation": None,
+    "capex_total": None,
+    "sales": None,
+    "total_assets": None,
+    "total_liabilities": None,
+    "retained_earnings": None,
+    "working_capital": None,
+    "ppe_net": None,
+}
+
+
+@st.cache_data(ttl=FUNDAMENTALS_TTL, show_spinner=False)
+def _greenwald_history(ticker: str) -> Dict[str, List[float]]:
+    t = _ticker(ticker)
+    is_a = _as_df(getattr(t, "financials", None))
+    cf_a = _as_df(getattr(t, "cashflow", None))
+    bs_a = _as_df(getattr(t, "balance_sheet", None))
+
+    _require_any(ticker, is_a, cf_a, bs_a)
+    return _greenwald_from(is_a, cf_a, bs_a)
 
 
 def fetch_greenwald_history(ticker: str) -> Dict[str, List[float]]:
@@ -338,44 +410,136 @@ def fetch_greenwald_history(ticker: str) -> Dict[str, List[float]]:
       sales (revenue), ppe_net, capex
     """
     try:
-        t = yf.Ticker(ticker)
-        is_a = _as_df(getattr(t, "financials", None))
-        cf_a = _as_df(getattr(t, "cashflow", None))
-        bs_a = _as_df(getattr(t, "balance_sheet", None))
-
-        sales_hist = _series_from_df(is_a, ["Total Revenue", "Operating Revenue", "Revenue"], max_points=8)
-
-        ppe_hist = _series_from_df(
-            bs_a,
-            ["Property Plant Equipment Net", "Net Property Plant Equipment", "Property, Plant & Equipment Net", "Net PPE"],
-            max_points=8,
-        )
-        if not ppe_hist:
-            gross_series = _series_from_df(bs_a, ["Property Plant Equipment", "Gross Property Plant And Equipment"], max_points=8)
-            acc_series = _series_from_df(bs_a, ["Accumulated Depreciation", "Accumulated Depreciation Amortization"], max_points=8)
-            if gross_series and acc_series and len(gross_series) == len(acc_series):
-                ppe_hist = [g - a for g, a in zip(gross_series, acc_series)]
-
-        capex_hist = _series_from_df(cf_a, ["Capital Expenditures", "Investments In Property Plant And Equipment"], max_points=8)
-        capex_hist = [abs(x) for x in capex_hist]  # ensure positive spend
-
-        return {"sales": sales_hist[-5:], "ppe_net": ppe_hist[-5:], "capex": capex_hist[-5:]}
+        return _greenwald_history(ticker)
     except Exception as e:
         print(f"Error fetching Greenwald history for {ticker}: {e}")
         return {"sales": [], "ppe_net": [], "capex": []}
 
 
+def _greenwald_from(is_a: pd.DataFrame, cf_a: pd.DataFrame, bs_a: pd.DataFrame) -> Dict[str, List[float]]:
+    sales_hist = _series_from_df(is_a, ["Total Revenue", "Operating Revenue", "Revenue"], max_points=8)
+
+    ppe_hist = _series_from_df(
+        bs_a,
+        ["Property Plant Equipment Net", "Net Property Plant Equipment", "Property, Plant & Equipment Net", "Net PPE"],
+        max_points=8,
+    )
+    if not ppe_hist:
+        gross_series = _series_from_df(bs_a, ["Property Plant Equipment", "Gross Property Plant And Equipment"], max_points=8)
+        acc_series = _series_from_df(bs_a, ["Accumulated Depreciation", "Accumulated Depreciation Amortization"], max_points=8)
+        if gross_series and acc_series and len(gross_series) == len(acc_series):
+            ppe_hist = [g - a for g, a in zip(gross_series, acc_series)]
+
+    capex_hist = _series_from_df(cf_a, ["Capital Expenditures", "Investments In Property Plant And Equipment"], max_points=8)
+    capex_hist = [abs(x) for x in capex_hist]  # ensure positive spend
+
+    return {"sales": sales_hist[-5:], "ppe_net": ppe_hist[-5:], "capex": capex_hist[-5:]}
+
+
+@st.cache_data(ttl=FUNDAMENTALS_TTL, show_spinner=False)
+def _working_capital_quarterly(ticker: str) -> List[float]:
+    bs_q = _as_df(getattr(_ticker(ticker), "quarterly_balance_sheet", None))
+    _require_any(ticker, bs_q)
+    return _working_capital_from(bs_q)
+
+
 def fetch_working_capital_quarterly(ticker: str) -> List[float]:
     """Return list (oldest->newest) of quarterly working capital values."""
     try:
-        t = yf.Ticker(ticker)
-        bs_q = _as_df(getattr(t, "quarterly_balance_sheet", None))
-        ca = _series_from_df(bs_q, ["Total Current Assets"], max_points=12)
-        cl = _series_from_df(bs_q, ["Total Current Liabilities"], max_points=12)
-        if not ca or not cl:
-            return []
-        n = min(len(ca), len(cl))
-        return [float(ca[i] - cl[i]) for i in range(n)]
+        return _working_capital_quarterly(ticker)
     except Exception as e:
         print(f"Error fetching working capital for {ticker}: {e}")
-        return []
\ No newline at end of file
+        return []
+
+
+def _working_capital_from(bs_q: pd.DataFrame) -> List[float]:
+    ca = _series_from_df(bs_q, ["Total Current Assets"], max_points=12)
+    cl = _series_from_df(bs_q, ["Total Current Liabilities"], max_points=12)
+    if not ca or not cl:
+        return []
+    n = min(len(ca), len(cl))
+    return [float(ca[i] - cl[i]) for i in range(n)]
+
+
+# Statement tables fetch_all() downloads concurrently.
+_STATEMENT_ATTRS = (
+    "quarterly_financials", "quarterly_cashflow", "quarterly_balance_sheet",
+    "financials", "cashflow", "balance_sheet",
+)
+
+
+@st.cache_data(ttl=PRICE_TTL, show_spinner=False)
+def _all(ticker: str) -> Dict[str, Any]:
+    """Cached body of fetch_all(); any failed request raises so it is retried next time."""
+    # One yf.Ticker per worker: its lazy properties fill per-instance caches
+    # without locking, so an instance must not be read from several threads.
+    # Constructing one does no I/O. The HTTP session is shared, as yfinance's
+    # own threaded download() does: curl_cffi keeps a curl handle per thread,
+    # and the requests fallback's urllib3 pool is thread-safe. It is looked up
+    # here, on the script thread, rather than from the workers.
+    session = get_http_session()
+
+    # Each request fails on its own (empty table, {} info, no fast cap) so one
+    # bad response does not discard the others; only "every statement empty"
+    # raises below, which keeps a total failure out of the cache.
+    def _statement(name: str) -> pd.DataFrame:
+        try:
+            return _as_df(getattr(_ticker(ticker, session), name, None))
+        except Exception:
+            return pd.DataFrame()
+
+    def _info() -> Dict[str, Any]:
+        try:
+            return _info_of(_ticker(ticker, session))
+        except Exception:
+            return {}
+
+    with ThreadPoolExecutor(max_workers=len(_STATEMENT_ATTRS) + 2) as pool:
+        futures = {pool.submit(_statement, name): name for name in _STATEMENT_ATTRS}
+        futures[pool.submit(_info)] = "info"
+        futures[pool.submit(_fast_market_cap, _ticker(ticker, session))] = "fast_market_cap"
+        got = {futures[f]: f.result() for f in as_completed(futures)}
+
+    is_q, cf_q, bs_q = got["quarterly_financials"], got["quarterly_cashflow"], got["quarterly_balance_sheet"]
+    is_a, cf_a, bs_a = got["financials"], got["cashflow"], got["balance_sheet"]
+    info = got["info"]
+    _require_any(ticker, is_q, cf_q, bs_q, is_a, cf_a, bs_a)
+
+    try:
+        result: Dict[str, Any] = _fundamentals_from(is_q, cf_q, is_a, cf_a, bs_a)
+    except Exception as e:
+        print(f"Error fetching fundamentals for {ticker}: {e}")
+        result = dict(_EMPTY_FUNDAMENTALS)
+    result.update(_profile_from(info))
+
+    mc = got["fast_market_cap"]
+    result["market_cap"] = mc if mc is not None else _nan_or(info.get("marketCap"))
+
+    try:
+        result["greenwald_history"] = _greenwald_from(is_a, cf_a, bs_a)
+    except Exception as e:
+        print(f"Error fetching Greenwald history for {ticker}: {e}")
+        result["greenwald_history"] = {"sales": [], "ppe_net": [], "capex": []}
+    try:
+        result["working_capital_quarterly"] = _working_capital_from(bs_q)
+    except Exception as e:
+        print(f"Error fetching working capital for {ticker}: {e}")
+        result["working_capital_quarterly"] = []
+    return result
+
+
+def fetch_all(ticker: str) -> Dict[str, Any]:
+    """
+    Everything the Fetch button needs in one call: the fetch_fundamentals() fields
+    plus sector, industry, market_cap, greenwald_history and
+    working_capital_quarterly. The statement, info and quote requests run
+    concurrently (each is a separate HTTPS round-trip), and every table is
+    downloaded once instead of once per fetcher.
+    """
+    try:
+        return _all(ticker)
+    except Exception as e:
+        print(f"Error fetching Yahoo data for {ticker}: {e}")
+        return dict(_EMPTY_FUNDAMENTALS, sector=None, industry=None, market_cap=None,
+                    greenwald_history={"sales": [], "ppe_net": [], "capex": []},
+                    working_capital_quarterly=[])